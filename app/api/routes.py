@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+import base64
+import binascii
+import json
+import os
 import time
 
-from ..database import get_db
-from ..models import AnalysisRequest
-from ..services.scraper import WebScraper
-from ..services.chunker import ContentChunker
-from ..services.analyzer import ContentAnalyzer
+from ..database import get_db, get_sessionmaker, get_async_session_local
+from ..models import AnalysisBatch, AnalysisDetail, AnalysisRequest, url_hash
+from ..services.container import ServiceContainer, get_services
+from ..services.pipeline import (
+    run_analysis, apply_result, apply_cached_result, apply_failure, index_fingerprint
+)
+from ..services.progress import progress
+from ..services.audit import audit_log
+from ..services.analysis_cache import FINISHED_STATUSES, analysis_cache, make_etag
+from ..services.profiling import PROFILE_HEADER, analysis_profiler
+from ..services.timings import AnalysisTimings, collect, stage
+from ..services.url_cache import normalize_url, result_cache
+from ..services.jobs import job_queue, JobQueueFull
+from ..services.batch import batch_pipeline
 
 router = APIRouter()
 
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+# Seconds between keep-alive comments on idle event streams
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+# Seconds clients and CDNs may reuse a finished analysis before revalidating
+ANALYSIS_MAX_AGE = int(os.getenv("ANALYSIS_MAX_AGE", "300"))
+
 class AnalyzeURLRequest(BaseModel):
     url: str
+    async_mode: bool = False  # Return 202 immediately and poll /analysis/{request_id}
 
 class AnalysisResponse(BaseModel):
     request_id: int
@@ -26,113 +49,535 @@ class AnalysisResponse(BaseModel):
     detailed_results: Optional[dict] = None
     analysis_duration: Optional[float] = None
     error_message: Optional[str] = None
+    source_request_id: Optional[int] = None
+    page_title: Optional[str] = None
+    page_description: Optional[str] = None
+    canonical_url: Optional[str] = None
+    final_url: Optional[str] = None
+    timings: Optional[dict] = None
+
+class AnalysisSummary(BaseModel):
+    request_id: int
+    url: str
+    status: str
+    requested_at: Optional[datetime] = None
+    credibility_score: Optional[float] = None
+    is_out_of_context: Optional[str] = None
+    is_propaganda: Optional[str] = None
+    page_title: Optional[str] = None
+    source_request_id: Optional[int] = None
+
+class AnalysisList(BaseModel):
+    items: List[AnalysisSummary]
+    next_cursor: Optional[str] = None  # Pass as cursor to get the next (older) page
+
+class AnalyzeBatchRequest(BaseModel):
+    urls: List[str]
+
+class BatchItem(BaseModel):
+    request_id: int
+    url: str
+    status: str
+    credibility_score: Optional[float] = None
+    error_message: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    batch_id: int
+    status: str  # running, completed
+    total: int
+    counts: Dict[str, int]
+    items: List[BatchItem]
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_url(
     request_data: AnalyzeURLRequest,
     request: Request,
-    db: Session = Depends(get_db)
+    response: Response,
+    sessions: async_sessionmaker = Depends(get_sessionmaker),
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Analyze a website URL for content credibility, propaganda, and context
+
+    With async_mode set, the analysis is queued and a 202 with the pending
+    request_id is returned; follow GET /analysis/{request_id}/events or poll
+    GET /analysis/{request_id} for the result.
+
+    Database sessions are only opened around the cache lookup and the final
+    write, so no pooled connection is held while the page is analyzed.
+
+    A result cache hit returns the reused analysis's request_id (also given
+    as source_request_id), not an id of its own: the row logging the hit is
+    written behind in a batch and has no id yet. Every other response
+    carries the id of the row created for this request.
+
+    A request carrying the X-Profile-Token header with the configured
+    PROFILING_TOKEN is profiled; fetch the report from
+    GET /analysis/{request_id}/profile.
     """
     start_time = time.time()
+    analysis_timings = AnalysisTimings()
+    profile = analysis_profiler.authorized(request.headers.get(PROFILE_HEADER))
 
     # Get client IP
     client_ip = request.client.host if request.client else None
 
-    # Create database record
+    # Create database record; requested_at is set now rather than left to
+    # its default, since the synchronous path only inserts the row once the
+    # analysis is done
+    normalized_url = normalize_url(request_data.url)
     analysis_request = AnalysisRequest(
         url=request_data.url,
+        normalized_url=normalized_url,
         user_ip=client_ip,
-        status="pending"
+        status="pending",
+        requested_at=datetime.now(timezone.utc)
     )
-    db.add(analysis_request)
-    db.commit()
-    db.refresh(analysis_request)
 
-    try:
-        # Step 1: Scrape website content
-        scraper = WebScraper()
-        content = scraper.fetch_content(request_data.url)
+    # Reuse a recent analysis of the same page if there is one
+    with collect(analysis_timings):
+        async with sessions() as db:
+            cached = await result_cache.lookup(db, normalized_url)
+    if cached is not None:
+        source_request_id, final_result = cached
+        apply_cached_result(analysis_request, source_request_id, final_result, start_time)
+        # Only an audit row; it is written in the background with others
+        audit_log.add(analysis_request)
+        return _build_response(analysis_request, request_id=source_request_id, detailed_results=final_result)
+
+    if request_data.async_mode:
+        async with sessions() as db:
+            db.add(analysis_request)
+            await db.commit()
+
+            try:
+                job_queue.submit(analysis_request.id, request_data.url, profile=profile)
+            except JobQueueFull as e:
+                apply_failure(analysis_request, e, start_time)
+                await db.commit()
+                raise HTTPException(status_code=503, detail=str(e))
+
+        response.status_code = 202
+        return AnalysisResponse(
+            request_id=analysis_request.id,
+            url=analysis_request.url,
+            status=analysis_request.status
+        )
 
-        if not content or len(content.strip()) < 100:
-            raise Exception("Insufficient content extracted from URL")
+    # The row is written once, with its outcome, when the analysis is done
+    profile_run = analysis_profiler.start() if profile else None
+    error = None
+    with collect(analysis_timings):
+        try:
+            final_result, scrape = await run_analysis(request_data.url, services)
+            apply_result(analysis_request, final_result, start_time, scrape)
+        except Exception as e:
+            error = e
+            apply_failure(analysis_request, e, start_time)
 
-        # Step 2: Chunk the content
-        chunker = ContentChunker()
-        chunks = chunker.chunk_content(content)
+    write_start = time.perf_counter()
+    with stage("db_write"):
+        async with sessions() as db:
+            db.add(analysis_request)
+            # INSERT ... RETURNING id, needed for the fingerprint rows
+            await db.flush()
+            if error is None and analysis_request.source_request_id is None:
+                await index_fingerprint(db, analysis_request.id, scrape)
+            # Stored in the same transaction, so the write time covers everything but the commit
+            analysis_timings.set("db_write_seconds", time.perf_counter() - write_start)
+            analysis_request.timings = analysis_timings.as_dict()
+            await db.commit()
 
-        # Step 3: Analyze each chunk
-        analyzer = ContentAnalyzer()
-        chunk_results = []
+    if profile_run is not None:
+        await analysis_profiler.save(profile_run, analysis_request.id)
 
-        for i, chunk in enumerate(chunks):
-            chunk_result = analyzer.analyze_chunk(chunk, i, len(chunks))
-            chunk_results.append(chunk_result)
+    if error is not None:
+        raise HTTPException(status_code=500, detail=str(error))
 
-        # Step 4: Aggregate results
-        final_result = analyzer.aggregate_results(chunk_results)
+    result_cache.store(normalized_url, analysis_request.source_request_id or analysis_request.id, final_result)
+    return _build_response(analysis_request)
 
-        # Step 5: Update database with results
-        analysis_duration = time.time() - start_time
+@router.post("/analyze/batch", response_model=BatchResponse, status_code=202)
+async def analyze_batch(
+    request_data: AnalyzeBatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Analyze a list of URLs in the background
 
-        analysis_request.status = "completed"
-        analysis_request.is_out_of_context = final_result.get("out_of_context", {}).get("assessment", "Uncertain")
-        analysis_request.is_propaganda = final_result.get("propaganda", {}).get("assessment", "Uncertain")
-        analysis_request.credibility_score = final_result.get("credibility_score", 0)
-        analysis_request.content_context = final_result.get("content_context", "")
-        analysis_request.detailed_results = final_result
-        analysis_request.analysis_duration = analysis_duration
+    Duplicate URLs (after normalization) are analyzed once. Each remaining URL
+    gets its own request record; recently analyzed pages are completed from
+    the cache straight away and the rest go through the batch pipeline. Poll
+    GET /analyze/batch/{batch_id} for progress.
+    """
+    start_time = time.time()
 
-        db.commit()
-        db.refresh(analysis_request)
+    if not request_data.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(request_data.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_URLS} URLs")
+    if not batch_pipeline.running:
+        raise HTTPException(status_code=503, detail="Batch pipeline is not running")
 
-        return AnalysisResponse(
-            request_id=analysis_request.id,
-            url=analysis_request.url,
-            status=analysis_request.status,
-            is_out_of_context=analysis_request.is_out_of_context,
-            is_propaganda=analysis_request.is_propaganda,
-            credibility_score=analysis_request.credibility_score,
-            content_context=analysis_request.content_context,
-            detailed_results=analysis_request.detailed_results,
-            analysis_duration=analysis_request.analysis_duration
+    # Deduplicate, keeping the first spelling of each URL
+    unique: Dict[str, str] = {}
+    for url in request_data.urls:
+        url = url.strip()
+        if url:
+            unique.setdefault(normalize_url(url), url)
+
+    client_ip = request.client.host if request.client else None
+    batch = AnalysisBatch(user_ip=client_ip, total=len(unique))
+    db.add(batch)
+    await db.flush()
+
+    analysis_requests = []
+    pending = []
+    for normalized_url, url in unique.items():
+        analysis_request = AnalysisRequest(
+            url=url,
+            normalized_url=normalized_url,
+            user_ip=client_ip,
+            status="pending",
+            batch_id=batch.id
         )
+        cached = await result_cache.lookup(db, normalized_url)
+        if cached is not None:
+            source_request_id, final_result = cached
+            apply_cached_result(analysis_request, source_request_id, final_result, start_time)
+        else:
+            pending.append(analysis_request)
+        analysis_requests.append(analysis_request)
+
+    db.add_all(analysis_requests)
+    await db.commit()
 
-    except Exception as e:
-        # Update database with error
-        analysis_request.status = "failed"
-        analysis_request.error_message = str(e)
-        analysis_request.analysis_duration = time.time() - start_time
-        db.commit()
+    batch_pipeline.submit([(analysis_request.id, analysis_request.url) for analysis_request in pending])
 
-        raise HTTPException(status_code=500, detail=str(e))
+    return _build_batch_response(batch, analysis_requests)
 
-@router.get("/analysis/{request_id}", response_model=AnalysisResponse)
-async def get_analysis(request_id: int, db: Session = Depends(get_db)):
+@router.get("/analyze/batch/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve the progress of a batch submission
+    """
+    batch = await db.get(AnalysisBatch, batch_id)
+
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    analysis_requests = list(await db.scalars(
+        select(AnalysisRequest)
+        .where(AnalysisRequest.batch_id == batch_id)
+        .order_by(AnalysisRequest.id)
+    ))
+    return _build_batch_response(batch, analysis_requests)
+
+@router.get("/analyses", response_model=AnalysisList)
+async def list_analyses(
+    url: Optional[str] = None,
+    host: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List past analyses, newest first
+
+    Filter by url (matched after normalization), host, status and a
+    requested_at range. Pages are fetched by keyset: next_cursor encodes the
+    last row's (requested_at, id), so every page is an index range scan
+    instead of an OFFSET that grows with the page number.
+    """
+    columns = [
+        AnalysisRequest.id, AnalysisRequest.url, AnalysisRequest.status, AnalysisRequest.requested_at,
+        AnalysisRequest.credibility_score, AnalysisRequest.is_out_of_context, AnalysisRequest.is_propaganda,
+        AnalysisRequest.page_title, AnalysisRequest.source_request_id,
+    ]
+    query = select(*columns)
+    if url:
+        query = query.where(AnalysisRequest.url_hash == url_hash(normalize_url(url)))
+    if host:
+        query = query.where(AnalysisRequest.host == host.strip().lower())
+    if status:
+        query = query.where(AnalysisRequest.status == status)
+    if since:
+        query = query.where(AnalysisRequest.requested_at >= since)
+    if until:
+        query = query.where(AnalysisRequest.requested_at < until)
+    if cursor:
+        requested_at, last_id = _decode_cursor(cursor)
+        query = query.where(tuple_(AnalysisRequest.requested_at, AnalysisRequest.id) < tuple_(requested_at, last_id))
+
+    query = query.order_by(AnalysisRequest.requested_at.desc(), AnalysisRequest.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].requested_at, rows[-1].id)
+
+    return AnalysisList(
+        items=[
+            AnalysisSummary(
+                request_id=row.id,
+                url=row.url,
+                status=row.status,
+                requested_at=row.requested_at,
+                credibility_score=row.credibility_score,
+                is_out_of_context=row.is_out_of_context,
+                is_propaganda=row.is_propaganda,
+                page_title=row.page_title,
+                source_request_id=row.source_request_id
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
+
+@router.get("/analysis/{request_id}", response_model=AnalysisResponse, response_model_exclude_unset=True)
+async def get_analysis(request_id: int, request: Request, fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_db)):
     """
     Retrieve a previous analysis by request ID
+
+    fields is an optional comma-separated list of response fields, e.g.
+    fields=credibility_score,page_title; request_id, url and status are
+    always returned. The detailed results, the bulk of a response, are only
+    read when listed or when fields is omitted.
+
+    Finished analyses never change, so their serialized responses are cached
+    (see services/analysis_cache.py). Every response carries a strong ETag;
+    a matching If-None-Match gets a 304 without a body.
     """
-    analysis_request = db.query(AnalysisRequest).filter(AnalysisRequest.id == request_id).first()
+    wanted = _response_fields(fields)
+
+    cached = await analysis_cache.get(request_id)
+    if cached is not None:
+        body, etag = cached
+        if fields is not None:
+            body = _select_fields(body, wanted)
+            etag = make_etag(body)
+        return _conditional_response(request, body, etag, finished=True)
+
+    analysis = await _read_analysis(db, request_id, wanted)
+    body = analysis.model_dump_json(exclude_unset=True).encode()
+    if fields is None and analysis.status in FINISHED_STATUSES:
+        etag = await analysis_cache.set(request_id, body)
+    else:
+        etag = make_etag(body)
+    return _conditional_response(request, body, etag, finished=analysis.status in FINISHED_STATUSES)
+
+@router.get("/analysis/{request_id}/events")
+async def analysis_events(request_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Stream the progress of an analysis as Server-Sent Events
+
+    Events: fetched, chunked (total_chunks), chunk (index and the provisional
+    result of that chunk), aggregating, then completed or failed, after which
+    the stream ends. A client that connects late gets the events so far first.
+    """
+    analysis_request = await db.get(AnalysisRequest, request_id)
 
     if not analysis_request:
         raise HTTPException(status_code=404, detail="Analysis not found")
 
+    status = analysis_request.status
+    error_message = analysis_request.error_message
+
+    async def stream() -> AsyncIterator[str]:
+        if status != "pending":
+            # Finished before the client subscribed (or was served from cache)
+            yield _finished_event(status, error_message)
+            return
+
+        async for message in progress.subscribe(request_id, timeout=EVENTS_KEEPALIVE):
+            if message is not None:
+                event_id, event, data = message
+                yield _sse(event, data, event_id)
+                continue
+
+            if await request.is_disconnected():
+                return
+            # Another process may have run the analysis, so check the record itself
+            finished = await _load_status(request_id)
+            if finished is not None and finished[0] != "pending":
+                yield _finished_event(*finished)
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/analysis/{request_id}/profile")
+async def get_profile(request_id: int, request: Request):
+    """
+    Download the profiler report of an analysis run with X-Profile-Token
+
+    Requires the same header, as reports expose the service's internals.
+    """
+    if not analysis_profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the token is wrong")
+
+    path = analysis_profiler.path(request_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No profile for this analysis")
+    return FileResponse(path, media_type="text/html", filename=f"analysis-{request_id}-profile.html")
+
+@router.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy"}
+
+def _build_response(analysis_request: AnalysisRequest, request_id: Optional[int] = None,
+                    detailed_results: Optional[dict] = None) -> AnalysisResponse:
+    if detailed_results is None:
+        detailed_results = analysis_request.detailed_results
     return AnalysisResponse(
-        request_id=analysis_request.id,
+        request_id=request_id or analysis_request.id,
         url=analysis_request.url,
         status=analysis_request.status,
         is_out_of_context=analysis_request.is_out_of_context,
         is_propaganda=analysis_request.is_propaganda,
         credibility_score=analysis_request.credibility_score,
         content_context=analysis_request.content_context,
-        detailed_results=analysis_request.detailed_results,
+        detailed_results=detailed_results,
         analysis_duration=analysis_request.analysis_duration,
-        error_message=analysis_request.error_message
+        error_message=analysis_request.error_message,
+        source_request_id=analysis_request.source_request_id,
+        page_title=analysis_request.page_title,
+        page_description=analysis_request.page_description,
+        canonical_url=analysis_request.canonical_url,
+        final_url=analysis_request.final_url,
+        timings=analysis_request.timings
     )
 
-@router.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+def _response_fields(fields: Optional[str]) -> List[str]:
+    if fields is None:
+        return list(AnalysisResponse.model_fields)
+    wanted = ["request_id", "url", "status"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in wanted:
+            continue
+        if name not in AnalysisResponse.model_fields:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+        wanted.append(name)
+    return wanted
+
+def _select_fields(body: bytes, wanted: List[str]) -> bytes:
+    """
+    Cut a cached full response down to the wanted fields
+
+    Serialized exactly as a response read with only those fields would be
+    (model field order, raw UTF-8), so both give the same ETag.
+    """
+    full = AnalysisResponse.model_validate_json(body)
+    return full.model_dump_json(include=set(wanted) & full.model_fields_set).encode()
+
+async def _read_analysis(db: AsyncSession, request_id: int, wanted: List[str]) -> AnalysisResponse:
+    names = [name for name in wanted if name not in ("request_id", "detailed_results")]
+    row = (await db.execute(
+        select(AnalysisRequest.id, AnalysisRequest.source_request_id, *[getattr(AnalysisRequest, name) for name in names])
+        .where(AnalysisRequest.id == request_id)
+    )).first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    values = {name: getattr(row, name) for name in names}
+    if "detailed_results" in wanted:
+        values["detailed_results"] = await _load_detailed_results(db, row.id, row.source_request_id)
+    return AnalysisResponse(request_id=row.id, **values)
+
+def _conditional_response(request: Request, body: bytes, etag: str, finished: bool) -> Response:
+    headers = {
+        "ETag": etag,
+        # Pending analyses still change, so caches must revalidate every time
+        "Cache-Control": f"public, max-age={ANALYSIS_MAX_AGE}" if finished else "no-cache",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses weak comparison
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+async def _load_detailed_results(db: AsyncSession, request_id: int, source_request_id: Optional[int]) -> Optional[dict]:
+    # Requests served from the result cache have none of their own and share their source's
+    for candidate in (request_id, source_request_id):
+        if candidate is not None:
+            detail = await db.get(AnalysisDetail, candidate)
+            if detail is not None:
+                return detail.results
+    return None
+
+def _encode_cursor(requested_at: datetime, request_id: int) -> str:
+    payload = json.dumps([requested_at.isoformat(), request_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        requested_at, request_id = json.loads(payload)
+        return datetime.fromisoformat(requested_at), int(request_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def _finished_event(status: str, error_message: Optional[str]) -> str:
+    if status == "failed":
+        return _sse("failed", {"error": error_message})
+    return _sse("completed", {"status": status})
+
+async def _load_status(request_id: int) -> Optional[tuple]:
+    # Short-lived session; the request's own session must not stay open for the whole stream
+    async with get_async_session_local()() as db:
+        analysis_request = await db.get(AnalysisRequest, request_id)
+        if analysis_request is None:
+            return None
+        return analysis_request.status, analysis_request.error_message
+
+def _build_batch_response(batch: AnalysisBatch, analysis_requests: List[AnalysisRequest]) -> BatchResponse:
+    counts: Dict[str, int] = {"pending": 0, "completed": 0, "failed": 0}
+    for analysis_request in analysis_requests:
+        counts[analysis_request.status] = counts.get(analysis_request.status, 0) + 1
+
+    return BatchResponse(
+        batch_id=batch.id,
+        status="running" if counts["pending"] else "completed",
+        total=batch.total,
+        counts=counts,
+        items=[
+            BatchItem(
+                request_id=analysis_request.id,
+                url=analysis_request.url,
+                status=analysis_request.status,
+                credibility_score=analysis_request.credibility_score,
+                error_message=analysis_request.error_message
+            )
+            for analysis_request in analysis_requests
+        ]
+    )
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base
 import os
@@ -6,6 +7,8 @@ import os
 # Lazy initialization - don't connect until needed
 _engine = None
 _SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
 
 def get_database_url():
     url = os.getenv("DATABASE_URL", "")
@@ -17,7 +20,19 @@ def get_database_url():
         url = url.replace("postgres://", "postgresql://", 1)
     return url
 
+def get_async_database_url():
+    """DATABASE_URL with its async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)"""
+    url = get_database_url()
+    if not url:
+        return None
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
 def get_engine():
+    """Synchronous engine, for command line tools"""
     global _engine
     if _engine is None:
         url = get_database_url()
@@ -33,22 +48,61 @@ def get_session_local():
             _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return _SessionLocal
 
-def get_db():
-    """Dependency for getting database session"""
-    SessionLocal = get_session_local()
-    if SessionLocal is None:
+def get_async_engine():
+    """Async engine used by the API and background workers"""
+    global _async_engine
+    if _async_engine is None:
+        url = get_async_database_url()
+        if url:
+            options = {"pool_pre_ping": True, "pool_recycle": 300}
+            if not url.startswith("sqlite"):
+                # Connections held at once = pool_size + max_overflow; size it below the server's limit
+                options.update(
+                    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+                    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                )
+            _async_engine = create_async_engine(url, **options)
+    return _async_engine
+
+def get_async_session_local():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        engine = get_async_engine()
+        if engine:
+            # Objects stay readable after commit instead of lazily reloading, which async sessions cannot do
+            _AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    return _AsyncSessionLocal
+
+async def get_db():
+    """Dependency for getting an async database session"""
+    AsyncSessionLocal = get_async_session_local()
+    if AsyncSessionLocal is None:
         raise Exception("Database not configured")
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def init_db():
+def get_sessionmaker():
+    """Dependency for routes that open short-lived sessions around their own writes"""
+    AsyncSessionLocal = get_async_session_local()
+    if AsyncSessionLocal is None:
+        raise Exception("Database not configured")
+    return AsyncSessionLocal
+
+async def init_db():
     """Initialize database tables"""
-    engine = get_engine()
+    engine = get_async_engine()
     if engine:
-        Base.metadata.create_all(bind=engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
         print("Database tables created")
     else:
         print("Skipping database init - no DATABASE_URL")
+
+async def close_db():
+    """Close pooled connections"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
@@ -1,16 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from .database import init_db
+from .database import init_db, close_db
 from .api.routes import router
+from .services.container import ServiceContainer
+from .services.jobs import job_queue
+from .services.batch import batch_pipeline
+from .services.audit import audit_log
+from .services.analysis_cache import analysis_cache
+from .services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, InFlightMiddleware, loop_lag_monitor, registry
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database and shared services on startup, release them on shutdown"""
+    try:
+        await init_db()
+        print("Database initialized successfully")
+    except Exception as e:
+        print(f"Database initialization warning: {e}")
+        print("App will continue - database will retry on first request")
+
+    # Build scraper, chunker and analyzer once and share them across requests
+    services = ServiceContainer()
+    services.warm()
+    app.state.services = services
+
+    # Start background workers for async_mode analyses, after failing any
+    # that a crashed process left pending
+    await job_queue.fail_abandoned()
+    job_queue.start(services)
+    batch_pipeline.start(services)
+    audit_log.start()
+    loop_lag_monitor.start()
+
+    yield
+
+    await loop_lag_monitor.stop()
+    await batch_pipeline.stop()
+    await job_queue.stop()
+    await audit_log.stop()
+    await services.close()
+    await analysis_cache.close()
+    await close_db()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Website Content Analyzer API",
     description="Analyze website content for credibility, propaganda, and context",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - allow frontend to communicate with backend
@@ -21,6 +62,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(InFlightMiddleware)
 
 # Include API routes
 app.include_router(router, prefix="/api", tags=["analysis"])
@@ -30,6 +72,11 @@ app.include_router(router, prefix="/api", tags=["analysis"])
 async def root_page():
     return {"message": "ReadSmart API is running", "status": "ok"}
 
+# Prometheus scrape target
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Serve static frontend files - check multiple possible locations
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 print(f"Looking for frontend at: {frontend_path}")
@@ -41,16 +88,6 @@ if os.path.exists(frontend_path):
 else:
     print(f"Warning: Frontend not found at {frontend_path}")
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    try:
-        init_db()
-        print("Database initialized successfully")
-    except Exception as e:
-        print(f"Database initialization warning: {e}")
-        print("App will continue - database will retry on first request")
-
 @app.get("/api")
 async def root():
     """Root API endpoint"""
@@ -59,8 +96,13 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/api/analyze",
+            "analyze_batch": "/api/analyze/batch",
+            "get_batch": "/api/analyze/batch/{batch_id}",
             "get_analysis": "/api/analysis/{request_id}",
-            "health": "/api/health"
+            "list_analyses": "/api/analyses",
+            "analysis_events": "/api/analysis/{request_id}/events",
+            "health": "/api/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -0,0 +1,169 @@
+"""
+Bring an existing database up to the current models
+
+The API creates missing tables on startup, but create_all never changes a
+table that already exists, so databases created before a column or index
+was added fail on their first query. This tool adds whatever the models
+define and the database lacks:
+
+    python -m app.migrate            # add missing tables, columns and indexes
+    python -m app.migrate --dry-run  # print the statements without running them
+
+Columns are added as nullable (or with their server default), rows that
+predate normalized_url/url_hash/host get them computed from url, results
+still in the old analysis_requests.detailed_results column are copied into
+analysis_details, and running it again once everything is current does
+nothing. The equivalent
+PostgreSQL statements are listed in the README.
+"""
+from typing import List
+from urllib.parse import urlsplit
+import argparse
+
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from .database import get_engine
+from .models import AnalysisRequest, Base, url_hash
+from .services.url_cache import normalize_url
+
+# Rows read at a time when filling in the URL keys
+BACKFILL_BATCH_SIZE = 1000
+
+
+def add_column_statement(connection: Connection, column) -> str:
+    """ALTER TABLE ... ADD COLUMN for a model column, with its foreign key if it has one"""
+    definition = str(CreateColumn(column).compile(dialect=connection.dialect))
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        definition += f" REFERENCES {target.table.name} ({target.name})"
+    return f"ALTER TABLE {column.table.name} ADD COLUMN {definition}"
+
+
+def pending_statements(connection: Connection) -> List[str]:
+    """DDL that adds the columns and indexes missing from existing tables"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # Created whole, with its indexes, by create_all
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                statements.append(add_column_statement(connection, column))
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=connection.dialect)))
+    return statements
+
+
+def backfill_url_keys(connection: Connection) -> int:
+    """Fill in normalized_url, url_hash and host for rows written before those columns existed"""
+    filled = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(AnalysisRequest.id, AnalysisRequest.url, AnalysisRequest.normalized_url)
+            .where(AnalysisRequest.url_hash.is_(None), AnalysisRequest.id > last_id)
+            .order_by(AnalysisRequest.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return filled
+        for row in rows:
+            normalized_url = row.normalized_url
+            if not normalized_url:
+                try:
+                    normalized_url = normalize_url(row.url)
+                except ValueError:
+                    continue  # Not a URL the API would have accepted; leave it unindexed
+            connection.execute(
+                update(AnalysisRequest.__table__)
+                .where(AnalysisRequest.id == row.id)
+                .values(
+                    normalized_url=normalized_url,
+                    url_hash=url_hash(normalized_url),
+                    host=urlsplit(normalized_url).hostname,
+                )
+            )
+            filled += 1
+        last_id = rows[-1].id
+
+
+def copy_detailed_results(connection: Connection, dry_run: bool = False) -> int:
+    """
+    Copy results from the old analysis_requests.detailed_results column into analysis_details
+
+    Rows that already have details are skipped. The old column is left in
+    place; drop it by hand once the copy has been checked.
+    """
+    inspector = inspect(connection)
+    if AnalysisRequest.__tablename__ not in inspector.get_table_names():
+        return 0
+    if "detailed_results" not in {column["name"] for column in inspector.get_columns(AnalysisRequest.__tablename__)}:
+        return 0
+
+    missing = "FROM analysis_requests AS r WHERE r.detailed_results IS NOT NULL"
+    if "analysis_details" in inspector.get_table_names():
+        missing += " AND NOT EXISTS (SELECT 1 FROM analysis_details AS d WHERE d.request_id = r.id)"
+    if dry_run:
+        return connection.execute(text(f"SELECT COUNT(*) {missing}")).scalar()
+    # Results are JSONB on PostgreSQL, where the old column was plain JSON
+    results = "r.detailed_results::jsonb" if connection.dialect.name == "postgresql" else "r.detailed_results"
+    return connection.execute(
+        text(f"INSERT INTO analysis_details (request_id, results) SELECT r.id, {results} {missing}")
+    ).rowcount
+
+
+def migrate(dry_run: bool = False) -> List[str]:
+    """Apply (or with dry_run, only list) the pending statements; returns them"""
+    engine = get_engine()
+    if engine is None:
+        raise SystemExit("DATABASE_URL is not set")
+
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        missing_tables = [table.name for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+        statements = pending_statements(connection)
+        if dry_run:
+            for name in missing_tables:
+                print(f"-- create table {name}")
+            copied = copy_detailed_results(connection, dry_run=True)
+            if copied:
+                print(f"-- copy detailed results of {copied} analyses into analysis_details")
+            return statements
+
+        Base.metadata.create_all(connection)
+        for statement in statements:
+            print(statement)
+            connection.execute(text(statement))
+        filled = backfill_url_keys(connection)
+        copied = copy_detailed_results(connection)
+
+    for name in missing_tables:
+        print(f"Created table {name}")
+    if filled:
+        print(f"Filled in normalized_url, url_hash and host for {filled} rows")
+    if copied:
+        print(f"Copied detailed results of {copied} analyses into analysis_details")
+    if not statements and not missing_tables and not filled and not copied:
+        print("Schema is up to date")
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+    args = parser.parse_args()
+
+    statements = migrate(dry_run=args.dry_run)
+    if args.dry_run:
+        for statement in statements:
+            print(f"{statement.strip()};")
+
+
+if __name__ == "__main__":
+    main()
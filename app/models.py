@@ -1,18 +1,48 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON, Float, ForeignKey, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
-from datetime import datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import hashlib
 
 Base = declarative_base()
 
+def url_hash(normalized_url: str) -> str:
+    """Hex SHA-256 of a normalized URL, as stored in AnalysisRequest.url_hash"""
+    return hashlib.sha256(normalized_url.encode("utf-8")).hexdigest()
+
+# Binary JSONB on PostgreSQL, which TOAST-compresses large values and keeps them out of line
+DetailJSON = JSON().with_variant(JSONB(), "postgresql")
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class AnalysisBatch(Base):
+    """Model to group the per-URL requests of a batch submission"""
+    __tablename__ = "analysis_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_ip = Column(String(45), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    total = Column(Integer, nullable=False, default=0)  # URLs after deduplication
+
+    def __repr__(self):
+        return f"<AnalysisBatch(id={self.id}, total={self.total})>"
+
 class AnalysisRequest(Base):
     """Model to track user analysis requests"""
     __tablename__ = "analysis_requests"
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String(2048), nullable=False)
+    normalized_url = Column(String(2048), nullable=True, index=True)  # Cache key, see services/url_cache.py
+    url_hash = Column(String(64), nullable=True)  # SHA-256 of normalized_url; short enough to index cheaply
+    host = Column(String(255), nullable=True)
     user_ip = Column(String(45), nullable=True)  # Support IPv6
-    requested_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Stamped by the app as well, so SQLite (which compares timestamps as text) stores one format
+    requested_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), index=True)
 
     # Analysis results
     is_out_of_context = Column(String(50), nullable=True)  # Yes/No/Uncertain
@@ -20,13 +50,78 @@ class AnalysisRequest(Base):
     credibility_score = Column(Float, nullable=True)  # 0-100
     content_context = Column(Text, nullable=True)  # General description
 
+    # Page metadata from the scrape
+    page_title = Column(String(1024), nullable=True)
+    page_description = Column(Text, nullable=True)
+    canonical_url = Column(String(2048), nullable=True)
+    final_url = Column(String(2048), nullable=True)  # After redirects
+    response_headers = Column(JSON, nullable=True)
+
     # Metadata
     analysis_duration = Column(Float, nullable=True)  # Seconds
+    timings = Column(JSON, nullable=True)  # Per-stage breakdown, see services/timings.py
     status = Column(String(20), default="pending")  # pending, completed, failed
     error_message = Column(Text, nullable=True)
+    source_request_id = Column(Integer, ForeignKey("analysis_requests.id"), nullable=True)  # Set when served from cache
+    batch_id = Column(Integer, ForeignKey("analysis_batches.id"), nullable=True, index=True)  # Set for batch submissions
+
+    # Full analysis output, in its own table; never loaded implicitly
+    detail = relationship("AnalysisDetail", uselist=False, lazy="raise", cascade="all, delete-orphan")
+
+    # History lookups filter on one of these and page backwards through requested_at
+    __table_args__ = (
+        Index("ix_analysis_requests_url_hash_requested_at", "url_hash", "requested_at"),
+        Index("ix_analysis_requests_host_requested_at", "host", "requested_at"),
+        Index("ix_analysis_requests_status_requested_at", "status", "requested_at"),
+    )
+
+    @validates("normalized_url")
+    def _derive_url_keys(self, key, value):
+        """Keep url_hash and host in step with normalized_url"""
+        self.url_hash = url_hash(value) if value else None
+        self.host = urlsplit(value).hostname if value else None
+        return value
+
+    @property
+    def detailed_results(self):
+        """Results attached to this object; rows read back from the database need detail loaded"""
+        return self.detail.results if self.detail is not None else None
 
-    # Store detailed analysis results
-    detailed_results = Column(JSON, nullable=True)
+    @detailed_results.setter
+    def detailed_results(self, value):
+        self.detail = AnalysisDetail(results=value) if value is not None else None
 
     def __repr__(self):
         return f"<AnalysisRequest(id={self.id}, url={self.url}, status={self.status})>"
+
+class AnalysisDetail(Base):
+    """Detailed results of an analysis, kept apart so summary reads stay small"""
+    __tablename__ = "analysis_details"
+
+    request_id = Column(Integer, ForeignKey("analysis_requests.id"), primary_key=True)
+    results = Column(DetailJSON, nullable=False)
+
+    def __repr__(self):
+        return f"<AnalysisDetail(request_id={self.request_id})>"
+
+class ContentFingerprint(Base):
+    """MinHash signature of an analyzed page's text, see services/near_dup.py"""
+    __tablename__ = "content_fingerprints"
+
+    request_id = Column(Integer, ForeignKey("analysis_requests.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # Packed 64-bit MinHash values
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ContentFingerprint(request_id={self.request_id})>"
+
+class FingerprintBand(Base):
+    """LSH band of a fingerprint; pages sharing any band key are near-duplicate candidates"""
+    __tablename__ = "fingerprint_bands"
+
+    id = Column(Integer, primary_key=True)
+    band_key = Column(BigInteger, nullable=False, index=True)  # Hash of band number and its MinHash values
+    request_id = Column(Integer, ForeignKey("content_fingerprints.request_id"), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<FingerprintBand(band_key={self.band_key}, request_id={self.request_id})>"
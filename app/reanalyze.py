@@ -0,0 +1,377 @@
+"""
+Offline bulk re-analysis of stored URLs through a batch LLM API
+
+Re-scoring thousands of pages through the interactive analyze path burns the
+rate limit for days. This tool splits the work into resumable steps that share
+a work directory:
+
+    python -m app.reanalyze prepare --dir work/   # re-fetch and chunk pages, write JSONL batch files
+    python -m app.reanalyze submit --dir work/    # hand the files to the batch backend
+    python -m app.reanalyze status --dir work/    # check on submitted batches
+    python -m app.reanalyze ingest --dir work/    # download results, aggregate, store new analyses
+
+--backend local answers batches with a file-based stand-in instead of the
+OpenAI Batch API, so the flow can be exercised without network access to
+OpenAI (use --local-aggregation on ingest to avoid aggregation calls too).
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import func
+
+from .database import get_session_local
+from .models import AnalysisRequest
+from .services.aggregation import aggregate_locally
+from .services.analyzer import PROMPT_VERSION, ContentAnalyzer
+from .services.batch_llm import (
+    BatchLLMBackend, LocalBatchBackend, OpenAIBatchBackend, COMPLETED, FAILED,
+    parse_output_line, request_line,
+)
+from .services.chunker import ContentChunker
+from .services.pipeline import apply_result
+from .services.scraper import ScrapeResult, WebScraper
+
+STATE_FILE = "state.json"
+
+# OpenAI limits: 50,000 requests and 200 MB per batch input file
+MAX_REQUESTS_PER_FILE = 50000
+MAX_BYTES_PER_FILE = 190 * 1024 * 1024
+
+
+def load_state(work_dir: str) -> Dict[str, Any]:
+    path = os.path.join(work_dir, STATE_FILE)
+    if not os.path.exists(path):
+        raise SystemExit(f"No {STATE_FILE} in {work_dir}; run prepare first")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(work_dir: str, state: Dict[str, Any]):
+    # Write then rename, so an interrupted run never leaves a truncated state file
+    path = os.path.join(work_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def get_backend(name: str, work_dir: str) -> BatchLLMBackend:
+    if name == "local":
+        return LocalBatchBackend(os.path.join(work_dir, "local_batches"))
+    return OpenAIBatchBackend(ContentAnalyzer().client)
+
+
+def select_requests(db, limit: Optional[int] = None, since: Optional[str] = None) -> List[AnalysisRequest]:
+    """Latest original (not cache-served) completed analysis of each distinct URL"""
+    url_key = func.coalesce(AnalysisRequest.normalized_url, AnalysisRequest.url)
+    latest = (
+        db.query(func.max(AnalysisRequest.id))
+        .filter(AnalysisRequest.status == "completed", AnalysisRequest.source_request_id.is_(None))
+        .group_by(url_key)
+    )
+    if since:
+        latest = latest.filter(AnalysisRequest.requested_at >= since)
+
+    query = db.query(AnalysisRequest).filter(AnalysisRequest.id.in_(latest)).order_by(AnalysisRequest.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+async def prepare(args):
+    """Fetch and chunk every selected URL and write the chunk prompts as batch input files"""
+    os.makedirs(args.dir, exist_ok=True)
+    if os.path.exists(os.path.join(args.dir, STATE_FILE)):
+        raise SystemExit(f"{args.dir} already holds a re-analysis; use a new directory")
+
+    db = get_session_local()()
+    try:
+        targets = [(ar.id, ar.url, ar.normalized_url) for ar in select_requests(db, args.limit, args.since)]
+    finally:
+        db.close()
+    print(f"Re-analyzing {len(targets)} URLs")
+
+    # Only builds request bodies; the batch backend makes the API calls
+    analyzer = ContentAnalyzer(offline=True)
+    scraper = WebScraper()
+    chunker = ContentChunker()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    state: Dict[str, Any] = {
+        "model": analyzer.model,
+        "prompt_version": PROMPT_VERSION,
+        "created_at": time.time(),
+        "pages": {},
+        "failed": {},
+        "files": [],
+    }
+    writer = _BatchFileWriter(args.dir, args.max_requests, args.max_bytes, state["files"])
+
+    async def fetch(source_id: int, url: str):
+        async with semaphore:
+            try:
+                return source_id, url, await scraper.fetch(url), None
+            except Exception as e:
+                return source_id, url, None, e
+
+    try:
+        tasks = [fetch(source_id, url) for source_id, url, _ in targets]
+        normalized = {source_id: normalized_url for source_id, _, normalized_url in targets}
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            source_id, url, scrape, error = await task
+            if error is None and (not scrape.text or len(scrape.text.strip()) < 100):
+                error = Exception("Insufficient content extracted from URL")
+            if error is not None:
+                state["failed"][str(source_id)] = {"url": url, "error": str(error)}
+                continue
+
+            chunked = chunker.chunk_content_with_counts(scrape.text)
+            for chunk_index, (chunk, _) in enumerate(chunked):
+                body = analyzer.analysis_request_body(chunk, chunk_index, len(chunked))
+                writer.write(request_line(f"{source_id}-{chunk_index}", body))
+
+            state["pages"][str(source_id)] = {
+                "url": url,
+                "normalized_url": normalized[source_id],
+                "token_counts": [tokens for _, tokens in chunked],
+                "title": scrape.title,
+                "description": scrape.description,
+                "canonical_url": scrape.canonical_url,
+                "final_url": scrape.final_url,
+                "headers": scrape.headers,
+                "content_truncated": scrape.truncated,
+                "bytes_downloaded": scrape.bytes_downloaded,
+            }
+            if done % 100 == 0:
+                print(f"  fetched {done}/{len(targets)}")
+    finally:
+        writer.close()
+        await scraper.close()
+        await analyzer.close()
+
+    save_state(args.dir, state)
+    print(f"Wrote {len(state['files'])} batch file(s) for {len(state['pages'])} pages "
+          f"({len(state['failed'])} could not be fetched)")
+
+
+def submit(args):
+    """Submit every batch file that has not been submitted yet"""
+    state = load_state(args.dir)
+    state["backend"] = state.get("backend") or args.backend
+    backend = get_backend(state["backend"], args.dir)
+
+    for entry in state["files"]:
+        if entry.get("batch_id"):
+            continue
+        entry["batch_id"] = backend.submit(os.path.join(args.dir, entry["input"]))
+        entry["status"] = None
+        # Record each submission straight away so a crash never submits a file twice
+        save_state(args.dir, state)
+        print(f"Submitted {entry['input']} as {entry['batch_id']}")
+
+
+def status(args) -> bool:
+    """Print the state of each batch; returns True once all are finished"""
+    state = load_state(args.dir)
+    backend = get_backend(state.get("backend") or args.backend, args.dir)
+
+    finished = True
+    for entry in state["files"]:
+        if not entry.get("batch_id"):
+            print(f"{entry['input']}: not submitted")
+            finished = False
+            continue
+        if entry.get("status") not in (COMPLETED, FAILED):
+            entry["status"] = backend.status(entry["batch_id"])
+        print(f"{entry['input']}: {entry['batch_id']} {entry['status']}")
+        finished = finished and entry["status"] in (COMPLETED, FAILED)
+
+    save_state(args.dir, state)
+    return finished
+
+
+async def ingest(args):
+    """Download batch outputs, aggregate each page's chunk results and store new analyses"""
+    while not status(args):
+        if not args.wait:
+            raise SystemExit("Some batches are still running; try again later or pass --wait")
+        await asyncio.sleep(args.poll_interval)
+
+    state = load_state(args.dir)
+    backend = get_backend(state.get("backend") or args.backend, args.dir)
+
+    chunk_results: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    for entry in state["files"]:
+        if entry["status"] != COMPLETED:
+            continue
+        output_path = os.path.join(args.dir, entry["input"].replace(".jsonl", ".output.jsonl"))
+        if not os.path.exists(output_path):
+            backend.download(entry["batch_id"], output_path)
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                custom_id, result, error = parse_output_line(line)
+                source_id, chunk_index = custom_id.rsplit("-", 1)
+                if error is None:
+                    chunk_results.setdefault(source_id, {})[int(chunk_index)] = result
+
+    analyzer = None if args.local_aggregation else ContentAnalyzer()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def aggregate(source_id: str, page: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        results = chunk_results.get(source_id, {})
+        token_counts = page["token_counts"]
+        if len(results) != len(token_counts):
+            return None
+        ordered = [results[i] for i in range(len(token_counts))]
+
+        if len(ordered) == 1:
+            final_result = dict(ordered[0])
+        elif analyzer is None:
+            final_result = aggregate_locally(ordered, token_counts)
+        else:
+            async with semaphore:
+                final_result = dict(await analyzer.aggregate_results_async(ordered, token_counts))
+
+        final_result["content_truncated"] = page["content_truncated"]
+        final_result["bytes_downloaded"] = page["bytes_downloaded"]
+        final_result["reanalysis"] = {"of_request_id": int(source_id), "prompt_version": state["prompt_version"]}
+        return final_result
+
+    # Pages stored by an earlier, possibly interrupted, run are not stored again
+    ingested = set(state.get("ingested", []))
+    pages = [(source_id, page) for source_id, page in state["pages"].items() if source_id not in ingested]
+    if ingested:
+        print(f"Skipping {len(state['pages']) - len(pages)} pages ingested by an earlier run")
+    start_time = time.time()
+    try:
+        final_results = await asyncio.gather(
+            *(aggregate(source_id, page) for source_id, page in pages), return_exceptions=True
+        )
+    finally:
+        if analyzer is not None:
+            await analyzer.close()
+
+    stored = failed = 0
+    uncommitted: List[str] = []
+    db = get_session_local()()
+
+    def commit():
+        # Record what is stored right after each commit, so a re-run picks up where this one stopped
+        db.commit()
+        ingested.update(uncommitted)
+        uncommitted.clear()
+        state["ingested"] = sorted(ingested)
+        save_state(args.dir, state)
+
+    try:
+        for (source_id, page), final_result in zip(pages, final_results):
+            if final_result is None or isinstance(final_result, Exception):
+                failed += 1
+                continue
+            scrape = ScrapeResult(
+                text="",
+                bytes_downloaded=page["bytes_downloaded"],
+                truncated=page["content_truncated"],
+                title=page["title"],
+                description=page["description"],
+                canonical_url=page["canonical_url"],
+                final_url=page["final_url"],
+                headers=page["headers"],
+            )
+            analysis_request = AnalysisRequest(url=page["url"], normalized_url=page["normalized_url"])
+            apply_result(analysis_request, final_result, start_time, scrape)
+            # Pages were analyzed together in batches; there is no per-page duration
+            analysis_request.analysis_duration = None
+            db.add(analysis_request)
+            uncommitted.append(source_id)
+            stored += 1
+            if stored % 500 == 0:
+                commit()
+        commit()
+    finally:
+        db.close()
+
+    print(f"Stored {stored} new analyses; {failed} pages had missing or failed chunk results")
+
+
+class _BatchFileWriter:
+    """Writes request lines into numbered JSONL files, rolling over at the batch API limits"""
+
+    def __init__(self, directory: str, max_requests: int, max_bytes: int, files: List[Dict[str, Any]]):
+        self.directory = directory
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.files = files
+        self._file = None
+        self._requests = 0
+        self._bytes = 0
+
+    def write(self, line: str):
+        data = (line + "\n").encode("utf-8")
+        if self._file is None or self._requests >= self.max_requests or self._bytes + len(data) > self.max_bytes:
+            self._roll()
+        self._file.write(data)
+        self._requests += 1
+        self._bytes += len(data)
+        self.files[-1]["requests"] = self._requests
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _roll(self):
+        self.close()
+        name = f"requests-{len(self.files) + 1:04d}.jsonl"
+        self._file = open(os.path.join(self.directory, name), "wb")
+        self._requests = 0
+        self._bytes = 0
+        self.files.append({"input": name, "requests": 0, "batch_id": None, "status": None})
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.reanalyze", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dir", required=True, help="Work directory shared by all steps")
+    parser.add_argument("--backend", choices=("openai", "local"), default="openai",
+                        help="Batch LLM backend (remembered after submit)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = commands.add_parser("prepare", help="Fetch and chunk pages, write batch input files")
+    prepare_parser.add_argument("--limit", type=int, help="Re-analyze at most this many URLs")
+    prepare_parser.add_argument("--since", help="Only URLs analyzed on or after this date (YYYY-MM-DD)")
+    prepare_parser.add_argument("--concurrency", type=int, default=16, help="Pages fetched at once")
+    prepare_parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS_PER_FILE)
+    prepare_parser.add_argument("--max-bytes", type=int, default=MAX_BYTES_PER_FILE)
+
+    commands.add_parser("submit", help="Submit batch files")
+    commands.add_parser("status", help="Show batch status")
+
+    ingest_parser = commands.add_parser("ingest", help="Aggregate batch results and store new analyses")
+    ingest_parser.add_argument("--wait", action="store_true", help="Poll until every batch has finished")
+    ingest_parser.add_argument("--poll-interval", type=float, default=60)
+    ingest_parser.add_argument("--concurrency", type=int, default=8, help="Aggregation LLM calls in flight")
+    ingest_parser.add_argument("--local-aggregation", action="store_true",
+                               help="Combine chunk results locally, never calling the LLM")
+
+    args = parser.parse_args(argv)
+    if get_session_local() is None:
+        raise SystemExit("DATABASE_URL is not set")
+
+    if args.command == "prepare":
+        asyncio.run(prepare(args))
+    elif args.command == "submit":
+        submit(args)
+    elif args.command == "status":
+        sys.exit(0 if status(args) else 1)
+    elif args.command == "ingest":
+        asyncio.run(ingest(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+import re
+
+ASSESSMENTS = ("Yes", "Uncertain", "No")  # Worst first
+MAX_LIST_ITEMS = 5
+
+
+def normalize_assessment(value: Any) -> str:
+    """Map free-form model output ("yes", "No.", ...) onto Yes/No/Uncertain"""
+    text = str(value or "").strip().lower()
+    if text.startswith("yes"):
+        return "Yes"
+    if text.startswith("no"):
+        return "No"
+    return "Uncertain"
+
+
+def disagreement(chunk_results: List[Dict[str, Any]], weights: Optional[Sequence[float]] = None) -> float:
+    """
+    Measure how much chunk analyses disagree, from 0 (identical) to 1
+
+    The larger of the credibility score range (as a fraction of 100) and, for
+    the out_of_context and propaganda assessments, the token share of chunks
+    outside the majority.
+    """
+    weights = _weights(chunk_results, weights)
+    scores = [_score(result) for result in chunk_results]
+    spread = (max(scores) - min(scores)) / 100
+
+    dissent = 0.0
+    total = sum(weights)
+    for key in ("out_of_context", "propaganda"):
+        shares = _assessment_shares(chunk_results, weights, key)
+        dissent = max(dissent, 1 - max(shares.values()) / total)
+
+    return max(spread, dissent)
+
+
+def aggregate_locally(chunk_results: List[Dict[str, Any]], weights: Optional[Sequence[float]] = None,
+                      policy: str = "majority") -> Dict[str, Any]:
+    """
+    Combine chunk analyses without an LLM call
+
+    Args:
+        chunk_results: Analysis results from each chunk
+        weights: Token count of each chunk (equal weights if omitted)
+        policy: "majority" takes the token-weighted majority assessment,
+            "worst_case" takes the most severe one (Yes > Uncertain > No)
+
+    Returns:
+        Aggregated analysis in the same format as the LLM aggregation
+    """
+    weights = _weights(chunk_results, weights)
+    total = sum(weights)
+    scores = [_score(result) for result in chunk_results]
+    credibility_score = round(sum(score * weight for score, weight in zip(scores, weights)) / total, 1)
+
+    result: Dict[str, Any] = {}
+    for key in ("out_of_context", "propaganda"):
+        shares = _assessment_shares(chunk_results, weights, key)
+        if policy == "worst_case":
+            assessment = next(a for a in ASSESSMENTS if shares.get(a))
+        else:
+            # Ties go to the more severe assessment
+            assessment = max(ASSESSMENTS, key=lambda a: (shares.get(a, 0), -ASSESSMENTS.index(a)))
+        result[key] = {
+            "assessment": assessment,
+            "explanation": _explanation(chunk_results, weights, key, assessment),
+        }
+
+    heaviest = max(range(len(chunk_results)), key=lambda i: weights[i])
+    result["credibility_score"] = credibility_score
+    result["content_context"] = chunk_results[heaviest].get("content_context", "")
+    result["key_concerns"] = _merge_lists(chunk_results, "key_concerns")
+    result["positive_indicators"] = _merge_lists(chunk_results, "positive_indicators")
+    result["summary"] = (
+        f"Combined from {len(chunk_results)} section analyses that broadly agree "
+        f"(credibility {min(scores):.0f}-{max(scores):.0f}, weighted average {credibility_score:.0f})."
+    )
+    result["aggregation"] = "local"
+    return result
+
+
+def _weights(chunk_results: List[Dict[str, Any]], weights: Optional[Sequence[float]]) -> List[float]:
+    if not weights or len(weights) != len(chunk_results) or sum(weights) <= 0:
+        return [1.0] * len(chunk_results)
+    return [float(w) for w in weights]
+
+
+def _score(result: Dict[str, Any]) -> float:
+    try:
+        return min(100.0, max(0.0, float(result.get("credibility_score", 0))))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _assessment(result: Dict[str, Any], key: str) -> str:
+    value = result.get(key)
+    if isinstance(value, dict):
+        value = value.get("assessment")
+    return normalize_assessment(value)
+
+
+def _assessment_shares(chunk_results: List[Dict[str, Any]], weights: List[float], key: str) -> Dict[str, float]:
+    shares: Dict[str, float] = defaultdict(float)
+    for result, weight in zip(chunk_results, weights):
+        shares[_assessment(result, key)] += weight
+    return shares
+
+
+def _explanation(chunk_results: List[Dict[str, Any]], weights: List[float], key: str, assessment: str) -> str:
+    # Explanation from the largest chunk that reached the chosen assessment
+    candidates = [
+        (weight, result[key].get("explanation", ""))
+        for result, weight in zip(chunk_results, weights)
+        if isinstance(result.get(key), dict) and _assessment(result, key) == assessment
+    ]
+    if not candidates:
+        return ""
+    return max(candidates, key=lambda candidate: candidate[0])[1]
+
+
+def _merge_lists(chunk_results: List[Dict[str, Any]], key: str) -> List[str]:
+    merged = []
+    seen = set()
+    for result in chunk_results:
+        items = result.get(key) or []
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            text = str(item).strip()
+            fingerprint = re.sub(r'[\W_]+', ' ', text.lower()).strip()
+            if text and fingerprint not in seen:
+                seen.add(fingerprint)
+                merged.append(text)
+    return merged[:MAX_LIST_ITEMS]
@@ -0,0 +1,114 @@
+from typing import Optional, Tuple
+import hashlib
+import os
+
+from .metrics import record_cache_lookup
+from .url_cache import LRUCache
+
+try:
+    import redis.asyncio as redis  # Shared tier across workers is optional
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Analyses in these states never change again, so their responses can be cached
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a serialized response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class AnalysisCache:
+    """
+    Read-through cache of serialized GET /analysis/{request_id} responses
+
+    Only finished analyses are stored, which are immutable, so entries are
+    never invalidated; they only age out. An in-process LRU is checked
+    first, then Redis when REDIS_URL is set and the redis package is
+    installed, so workers share what any of them has loaded.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[int] = None,
+                 redis_url: Optional[str] = None):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Responses kept in process; 0 disables caching
+                (defaults to ANALYSIS_CACHE_SIZE, or 256)
+            ttl: Seconds a response is kept (defaults to ANALYSIS_CACHE_TTL, or 3600)
+            redis_url: Shared Redis tier (defaults to REDIS_URL; empty disables it)
+        """
+        self.max_size = max_size if max_size is not None else int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+        self.ttl = ttl if ttl is not None else int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+        self.redis_url = redis_url if redis_url is not None else os.getenv("REDIS_URL", "")
+        self.memory = LRUCache(self.max_size)
+        self._redis = None
+
+        if self.redis_url and not REDIS_AVAILABLE:
+            print("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    async def get(self, request_id: int) -> Optional[Tuple[bytes, str]]:
+        """Return (response body, ETag) or None"""
+        if not self.enabled:
+            return None
+
+        entry = self.memory.get(str(request_id))
+        if entry is None:
+            entry = await self._get_shared(request_id)
+        record_cache_lookup("analysis", entry is not None)
+        return entry
+
+    async def set(self, request_id: int, body: bytes) -> str:
+        """Store the response body of a finished analysis and return its ETag"""
+        etag = make_etag(body)
+        if not self.enabled:
+            return etag
+
+        self.memory.set(str(request_id), (body, etag), self.ttl)
+        client = self._client()
+        if client is not None:
+            try:
+                await client.set(self._key(request_id), body, ex=self.ttl)
+            except Exception as e:
+                print(f"Analysis cache write failed: {e}")
+        return etag
+
+    async def _get_shared(self, request_id: int) -> Optional[Tuple[bytes, str]]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            body = await client.get(self._key(request_id))
+        except Exception as e:
+            print(f"Analysis cache read failed: {e}")
+            return None
+        if body is None:
+            return None
+
+        entry = (body, make_etag(body))
+        self.memory.set(str(request_id), entry, self.ttl)
+        return entry
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _client(self):
+        if self._redis is None and self.redis_url and REDIS_AVAILABLE:
+            self._redis = redis.from_url(self.redis_url)
+        return self._redis
+
+    @staticmethod
+    def _key(request_id: int) -> str:
+        return f"analysis:{request_id}"
+
+
+analysis_cache = AnalysisCache()
@@ -1,17 +1,62 @@
-from openai import OpenAI
-from typing import List, Dict, Any
+from openai import OpenAI, AsyncOpenAI
+from typing import Callable, List, Dict, Any, Optional, Sequence
+import asyncio
 import json
 import os
 
+from .aggregation import aggregate_locally, disagreement
+from .llm_cache import LLMResponseCache, get_llm_cache
+from .timings import llm_call, record_llm_cache_hit, record_llm_usage
+
+# Bump whenever a prompt below changes so cached responses are not reused
+PROMPT_VERSION = "1"
+
+ANALYSIS_SYSTEM_PROMPT = "You are an expert content analyst specializing in detecting misinformation, propaganda, and evaluating source credibility. Provide objective, evidence-based analysis."
+AGGREGATION_SYSTEM_PROMPT = "You are synthesizing multiple analyses of chunks from the same website. Provide a coherent, unified analysis that considers all chunks."
+
+# Limits applied to chunk results before they are fed into a tree aggregation prompt
+COMPACT_TEXT_CHARS = 400
+COMPACT_LIST_ITEMS = 5
+COMPACT_ITEM_CHARS = 200
+
 class ContentAnalyzer:
     """Service to analyze website content using OpenAI GPT-4"""
 
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, max_concurrency: Optional[int] = None, cache: Optional[LLMResponseCache] = None,
+                 offline: bool = False):
+        """
+        Initialize analyzer
+
+        Args:
+            max_concurrency: Maximum number of chunk analyses in flight at once
+                (defaults to ANALYSIS_MAX_CONCURRENCY, or 5)
+            cache: LLM response cache (defaults to the shared on-disk cache)
+            offline: Only build request bodies for a batch API, without OpenAI
+                clients, so no API key is needed
+        """
+        self.client: Optional[OpenAI] = None
+        self.async_client: Optional[AsyncOpenAI] = None
+        if not offline:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable is required")
+            self.client = OpenAI(api_key=api_key)
+            self.async_client = AsyncOpenAI(api_key=api_key)
         self.model = "gpt-4o-mini"
+        self.max_concurrency = max_concurrency or int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "5"))
+        # "tree" merges results in groups of aggregation_group_size, level by level; "flat" sends them all at once
+        self.aggregation_mode = os.getenv("AGGREGATION_MODE", "tree")
+        self.aggregation_group_size = max(2, int(os.getenv("AGGREGATION_GROUP_SIZE", "4")))
+        # Chunk results that disagree by no more than this (0-1) are combined locally, without an LLM call
+        self.local_aggregation_threshold = float(os.getenv("AGGREGATION_LOCAL_THRESHOLD", "0.3"))
+        self.assessment_policy = os.getenv("AGGREGATION_ASSESSMENT_POLICY", "majority")
+        self.cache = cache if cache is not None else get_llm_cache()
+
+    async def close(self):
+        """Close the OpenAI clients' HTTP connection pools"""
+        if self.client is not None:
+            self.client.close()
+            await self.async_client.close()
 
     def analyze_chunk(self, chunk: str, chunk_index: int, total_chunks: int) -> Dict[str, Any]:
         """
@@ -28,34 +73,70 @@ class ContentAnalyzer:
         prompt = self._build_analysis_prompt(chunk, chunk_index, total_chunks)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert content analyst specializing in detecting misinformation, propaganda, and evaluating source credibility. Provide objective, evidence-based analysis."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,  # Lower temperature for more consistent analysis
-                response_format={"type": "json_object"}
-            )
-
-            result = json.loads(response.choices[0].message.content)
-            return result
+            return self._complete("analysis", chunk, ANALYSIS_SYSTEM_PROMPT, prompt)
+
+        except Exception as e:
+            raise Exception(f"AI analysis failed: {str(e)}")
+
+    async def analyze_chunk_async(self, chunk: str, chunk_index: int, total_chunks: int) -> Dict[str, Any]:
+        """Async variant of analyze_chunk using the AsyncOpenAI client"""
+        prompt = self._build_analysis_prompt(chunk, chunk_index, total_chunks)
+
+        try:
+            return await self._complete_async("analysis", chunk, ANALYSIS_SYSTEM_PROMPT, prompt)
 
         except Exception as e:
             raise Exception(f"AI analysis failed: {str(e)}")
 
-    def aggregate_results(self, chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analysis_request_body(self, chunk: str, chunk_index: int, total_chunks: int) -> Dict[str, Any]:
+        """Chat completion parameters for analyzing a chunk, for submission through a batch API"""
+        return self._completion_params(ANALYSIS_SYSTEM_PROMPT, self._build_analysis_prompt(chunk, chunk_index, total_chunks))
+
+    async def analyze_chunks(self, chunks: List[str],
+                             on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Analyze all chunks concurrently, bounded by max_concurrency
+
+        Args:
+            chunks: Text chunks produced by the chunker
+            on_result: Called with (chunk_index, result) as each chunk finishes
+
+        Returns:
+            List of analysis results in the same order as the chunks
+
+        If any chunk fails, the analyses still running are cancelled and the
+        first error is raised.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        total_chunks = len(chunks)
+
+        async def analyze(chunk: str, chunk_index: int) -> Dict[str, Any]:
+            async with semaphore:
+                with llm_call(chunk_index):
+                    result = await self.analyze_chunk_async(chunk, chunk_index, total_chunks)
+            if on_result is not None:
+                on_result(chunk_index, result)
+            return result
+
+        # gather preserves argument order, so results line up with chunks
+        tasks = [asyncio.create_task(analyze(chunk, i)) for i, chunk in enumerate(chunks)]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other tasks running; stop them spending tokens on a failed request
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def aggregate_results(self, chunk_results: List[Dict[str, Any]],
+                          weights: Optional[Sequence[float]] = None) -> Dict[str, Any]:
         """
         Aggregate analysis results from multiple chunks into final analysis
 
         Args:
             chunk_results: List of analysis results from each chunk
+            weights: Token count of each chunk, used by local aggregation
 
         Returns:
             Aggregated final analysis
@@ -67,32 +148,131 @@ class ContentAnalyzer:
         if len(chunk_results) == 1:
             return chunk_results[0]
 
+        # Chunks that broadly agree don't need an LLM to synthesize them
+        local_result = self._aggregate_locally(chunk_results, weights)
+        if local_result is not None:
+            return local_result
+
         # Aggregate multiple chunks
         prompt = self._build_aggregation_prompt(chunk_results)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are synthesizing multiple analyses of chunks from the same website. Provide a coherent, unified analysis that considers all chunks."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-
-            result = json.loads(response.choices[0].message.content)
-            return result
+            return self._complete("aggregation", prompt, AGGREGATION_SYSTEM_PROMPT, prompt)
+
+        except Exception as e:
+            raise Exception(f"Result aggregation failed: {str(e)}")
+
+    async def aggregate_results_async(self, chunk_results: List[Dict[str, Any]],
+                                      weights: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Async variant of aggregate_results using the AsyncOpenAI client
+
+        In tree mode, results are merged in groups of aggregation_group_size
+        (groups of one level run concurrently) until a single result is left,
+        so prompt size stays bounded and latency grows with the log of the
+        chunk count. Documents with no more chunks than one group make a
+        single call either way.
+        """
+        if not chunk_results:
+            raise ValueError("No chunk results to aggregate")
+
+        if len(chunk_results) == 1:
+            return chunk_results[0]
+
+        local_result = self._aggregate_locally(chunk_results, weights)
+        if local_result is not None:
+            return local_result
+
+        try:
+            if self.aggregation_mode == "tree":
+                return await self._tree_aggregate(chunk_results)
+
+            prompt = self._build_aggregation_prompt(chunk_results)
+            return await self._complete_async("aggregation", prompt, AGGREGATION_SYSTEM_PROMPT, prompt)
 
         except Exception as e:
             raise Exception(f"Result aggregation failed: {str(e)}")
 
+    def _aggregate_locally(self, chunk_results: List[Dict[str, Any]],
+                           weights: Optional[Sequence[float]]) -> Optional[Dict[str, Any]]:
+        """Combine chunk results locally, or None if they disagree too much"""
+        if disagreement(chunk_results, weights) > self.local_aggregation_threshold:
+            return None
+        return aggregate_locally(chunk_results, weights, self.assessment_policy)
+
+    async def _tree_aggregate(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        group_size = self.aggregation_group_size
+
+        async def merge(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+            if len(group) == 1:
+                return group[0]
+            prompt = self._build_aggregation_prompt(group, compact=True)
+            async with semaphore:
+                return await self._complete_async("aggregation", prompt, AGGREGATION_SYSTEM_PROMPT, prompt)
+
+        while len(results) > 1:
+            groups = [results[i:i + group_size] for i in range(0, len(results), group_size)]
+            results = await asyncio.gather(*(merge(group) for group in groups))
+        return results[0]
+
+    def _complete(self, kind: str, cache_text: str, system_prompt: str, prompt: str) -> Dict[str, Any]:
+        """Run a JSON chat completion, consulting the response cache first"""
+        key = self._cache_key(kind, cache_text)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_llm_cache_hit()
+                return cached
+
+        response = self.client.chat.completions.create(**self._completion_params(system_prompt, prompt))
+        record_llm_usage(kind, response.usage)
+        result = json.loads(response.choices[0].message.content)
+
+        if key:
+            self.cache.set(key, result)
+        return result
+
+    async def _complete_async(self, kind: str, cache_text: str, system_prompt: str, prompt: str) -> Dict[str, Any]:
+        """Async variant of _complete; the on-disk cache is read and written in a thread"""
+        key = self._cache_key(kind, cache_text)
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                record_llm_cache_hit()
+                return cached
+
+        response = await self.async_client.chat.completions.create(**self._completion_params(system_prompt, prompt))
+        record_llm_usage(kind, response.usage)
+        result = json.loads(response.choices[0].message.content)
+
+        if key:
+            await asyncio.to_thread(self.cache.set, key, result)
+        return result
+
+    def _cache_key(self, kind: str, text: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return LLMResponseCache.make_key(self.model, PROMPT_VERSION, kind, text)
+
+    def _completion_params(self, system_prompt: str, prompt: str) -> Dict[str, Any]:
+        """Build chat completion parameters shared by the sync and async clients"""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,  # Lower temperature for more consistent analysis
+            "response_format": {"type": "json_object"}
+        }
+
     def _build_analysis_prompt(self, chunk: str, chunk_index: int, total_chunks: int) -> str:
         """Build the prompt for analyzing a single chunk"""
         chunk_info = f"(Chunk {chunk_index + 1} of {total_chunks})" if total_chunks > 1 else ""
@@ -137,9 +317,12 @@ Return ONLY valid JSON in this exact format:
     "positive_indicators": ["indicator 1", "indicator 2"]
 }}"""
 
-    def _build_aggregation_prompt(self, chunk_results: List[Dict[str, Any]]) -> str:
+    def _build_aggregation_prompt(self, chunk_results: List[Dict[str, Any]], compact: bool = False) -> str:
         """Build prompt for aggregating multiple chunk analyses"""
-        chunks_summary = json.dumps(chunk_results, indent=2)
+        if compact:
+            chunks_summary = json.dumps([_compact_result(r) for r in chunk_results], separators=(',', ':'), ensure_ascii=False)
+        else:
+            chunks_summary = json.dumps(chunk_results, indent=2)
 
         return f"""You have analyzed multiple chunks from the same website. Here are the individual analyses:
 
@@ -161,3 +344,29 @@ Return ONLY valid JSON in this exact format:
     "positive_indicators": ["indicator 1", "indicator 2"],
     "summary": "Overall assessment considering all chunks..."
 }}"""
+
+
+def _compact_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim a chunk (or partial aggregate) result to the fields aggregation needs"""
+    def clip(text: Any, limit: int) -> str:
+        text = str(text or "")
+        return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+    compact = {}
+    for key in ("out_of_context", "propaganda"):
+        value = result.get(key)
+        if isinstance(value, dict):
+            compact[key] = {
+                "assessment": value.get("assessment", "Uncertain"),
+                "explanation": clip(value.get("explanation"), COMPACT_TEXT_CHARS),
+            }
+    if "credibility_score" in result:
+        compact["credibility_score"] = result["credibility_score"]
+    for key in ("content_context", "summary"):
+        if result.get(key):
+            compact[key] = clip(result[key], COMPACT_TEXT_CHARS)
+    for key in ("key_concerns", "positive_indicators"):
+        items = result.get(key) or []
+        if isinstance(items, list):
+            compact[key] = [clip(item, COMPACT_ITEM_CHARS) for item in items[:COMPACT_LIST_ITEMS]]
+    return compact
@@ -0,0 +1,97 @@
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+import asyncio
+import os
+
+from sqlalchemy import insert, inspect
+
+from ..database import get_async_session_local
+from ..models import AnalysisRequest
+
+
+class AuditLogBuffer:
+    """
+    Write-behind buffer for request rows that no response depends on
+
+    Requests served from the result cache only need a row for the audit
+    trail. Those rows are queued here and written with one multi-row INSERT
+    when batch_size rows have piled up or flush_interval has passed,
+    whichever comes first. Under load, hundreds of rows share a single round
+    trip instead of taking a pooled connection each.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, batch_size: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        """
+        Initialize buffer
+
+        Args:
+            flush_interval: Longest a row waits before it is written, in seconds
+                (defaults to AUDIT_FLUSH_INTERVAL, or 1)
+            batch_size: Rows that trigger an early flush (defaults to AUDIT_BATCH_SIZE, or 200)
+            max_pending: Rows kept while the database is unreachable; the oldest are
+                dropped beyond this (defaults to AUDIT_MAX_PENDING, or 10000)
+        """
+        self.flush_interval = flush_interval or float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+        self.batch_size = batch_size or int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+        self.max_pending = max_pending or int(os.getenv("AUDIT_MAX_PENDING", "10000"))
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flush loop on the running event loop"""
+        if self._task is not None:
+            return
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="audit-log-flush")
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def add(self, analysis_request: AnalysisRequest):
+        """Queue a row to be inserted"""
+        # Stamp it now rather than when it reaches the database
+        analysis_request.requested_at = datetime.now(timezone.utc)
+        self._pending.append({
+            column.key: getattr(analysis_request, column.key)
+            for column in inspect(AnalysisRequest).column_attrs
+            if column.key != "id"
+        })
+        if len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            print("Audit log buffer full, dropping oldest row")
+        if self._full is not None and len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def flush(self):
+        """Insert pending rows, batch_size per statement"""
+        while self._pending:
+            rows = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                async with get_async_session_local()() as db:
+                    await db.execute(insert(AnalysisRequest), rows)
+                    await db.commit()
+            except Exception as e:
+                # Keep the rows for the next attempt
+                self._pending.extendleft(reversed(rows))
+                print(f"Audit log flush failed: {e}")
+                return
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+
+audit_log = AuditLogBuffer()
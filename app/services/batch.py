@@ -0,0 +1,159 @@
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+import asyncio
+import os
+import time
+
+from .container import ServiceContainer
+from .pipeline import fail_pending, scrape_page, find_near_duplicate, chunk_page, analyze_page, record_outcome
+from .jobs import INTERRUPTED_MESSAGE
+from .timings import AnalysisTimings, collect
+
+# (request_id, url, start_time, timings) followed by whatever earlier stages produced
+Job = Tuple[Any, ...]
+
+
+class BatchPipeline:
+    """
+    Staged pipeline for batch submissions
+
+    Scraping, chunking and LLM analysis each run in their own pool of worker
+    tasks with bounded queues in between, so a slow stage holds back the one
+    before it instead of letting fetched pages pile up in memory. Scraping is
+    network bound, chunking is CPU bound and runs in threads, and analysis is
+    bounded by the OpenAI rate limit, so each gets its own concurrency.
+    """
+
+    def __init__(self, scrape_concurrency: Optional[int] = None, chunk_concurrency: Optional[int] = None,
+                 analyze_concurrency: Optional[int] = None, queue_size: Optional[int] = None):
+        """
+        Initialize batch pipeline
+
+        Args:
+            scrape_concurrency: Pages fetched at once (defaults to BATCH_SCRAPE_CONCURRENCY, or 8)
+            chunk_concurrency: Pages tokenized at once (defaults to BATCH_CHUNK_CONCURRENCY, or 2)
+            analyze_concurrency: Pages analyzed at once (defaults to BATCH_ANALYZE_CONCURRENCY, or 4)
+            queue_size: Capacity of each queue between stages (defaults to BATCH_QUEUE_SIZE, or 16)
+        """
+        self.scrape_concurrency = scrape_concurrency or int(os.getenv("BATCH_SCRAPE_CONCURRENCY", "8"))
+        self.chunk_concurrency = chunk_concurrency or int(os.getenv("BATCH_CHUNK_CONCURRENCY", "2"))
+        self.analyze_concurrency = analyze_concurrency or int(os.getenv("BATCH_ANALYZE_CONCURRENCY", "4"))
+        self.queue_size = queue_size or int(os.getenv("BATCH_QUEUE_SIZE", "16"))
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._feeders: Set[asyncio.Task] = set()
+        self._services: Optional[ServiceContainer] = None
+        # Submitted jobs whose outcome has not been recorded yet
+        self._unfinished: Set[int] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self, services: ServiceContainer):
+        """Spawn stage workers on the running event loop"""
+        if self._workers:
+            return
+        self._services = services
+        scrape_queue = asyncio.Queue(maxsize=self.queue_size)
+        chunk_queue = asyncio.Queue(maxsize=self.queue_size)
+        analyze_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues = [scrape_queue, chunk_queue, analyze_queue]
+
+        stages = [
+            ("scrape", self.scrape_concurrency, self._scrape, scrape_queue, chunk_queue),
+            ("chunk", self.chunk_concurrency, self._chunk, chunk_queue, analyze_queue),
+            ("analyze", self.analyze_concurrency, self._analyze, analyze_queue, None),
+        ]
+        for name, concurrency, step, inbox, outbox in stages:
+            self._workers.extend(
+                asyncio.create_task(self._stage_worker(step, inbox, outbox), name=f"batch-{name}-{i}")
+                for i in range(concurrency)
+            )
+
+    async def stop(self):
+        """Cancel feeders and stage workers and fail the URLs they had not finished"""
+        tasks = list(self._feeders) + self._workers
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._feeders.clear()
+        self._workers = []
+        self._queues = []
+
+        unfinished, self._unfinished = self._unfinished, set()
+        try:
+            await fail_pending(INTERRUPTED_MESSAGE, request_ids=unfinished)
+        except Exception as e:
+            print(f"Could not fail {len(unfinished)} interrupted batch analyses: {e}")
+
+    def submit(self, jobs: Sequence[Tuple[int, str]]):
+        """
+        Feed pending AnalysisRequest rows into the pipeline
+
+        Returns immediately; a feeder task waits for room in the scrape queue,
+        so large batches are admitted as fast as the pipeline drains.
+
+        Args:
+            jobs: (request_id, url) for each pending database record
+        """
+        if not self._workers:
+            raise RuntimeError("Batch pipeline is not running")
+        start_time = time.time()
+        self._unfinished.update(request_id for request_id, _ in jobs)
+        feeder = asyncio.create_task(self._feed([
+            (request_id, url, start_time, AnalysisTimings()) for request_id, url in jobs
+        ]))
+        self._feeders.add(feeder)
+        feeder.add_done_callback(self._feeders.discard)
+
+    async def _feed(self, jobs: List[Job]):
+        for job in jobs:
+            await self._queues[0].put(job)
+
+    async def _stage_worker(self, step: Callable[[Job], Awaitable[Optional[Job]]],
+                            inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            job = await inbox.get()
+            try:
+                # A job moves between worker tasks, so its timings travel with it
+                with collect(job[3]):
+                    try:
+                        result = await step(job)
+                    except Exception as e:
+                        await record_outcome(job[0], job[2], error=e)
+                        self._unfinished.discard(job[0])
+                        continue
+                if result is None:
+                    # The step recorded the outcome
+                    self._unfinished.discard(job[0])
+                elif outbox is not None:
+                    await outbox.put(result)
+            except Exception as e:
+                print(f"Batch job {job[0]} could not be recorded: {e}")
+            finally:
+                inbox.task_done()
+
+    async def _scrape(self, job: Job) -> Optional[Job]:
+        request_id, url, start_time, timings = job
+        scrape = await scrape_page(url, self._services, request_id)
+
+        # Syndicated copies of a recent analysis finish here
+        final_result = await find_near_duplicate(scrape, request_id)
+        if final_result is not None:
+            await record_outcome(request_id, start_time, final_result, scrape)
+            return None
+        return request_id, url, start_time, timings, scrape
+
+    async def _chunk(self, job: Job) -> Job:
+        request_id, url, start_time, timings, scrape = job
+        # Tokenizing is CPU bound; keep it off the event loop
+        chunked = await asyncio.to_thread(chunk_page, scrape, self._services, request_id)
+        return request_id, url, start_time, timings, scrape, chunked
+
+    async def _analyze(self, job: Job) -> None:
+        request_id, url, start_time, timings, scrape, chunked = job
+        final_result = await analyze_page(chunked, scrape, self._services, request_id)
+        await record_outcome(request_id, start_time, final_result, scrape)
+
+
+batch_pipeline = BatchPipeline()
@@ -0,0 +1,170 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import shutil
+
+# Batch states, mirroring the OpenAI Batch API
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Chat completion endpoint every request line targets
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+def request_line(custom_id: str, body: Dict[str, Any]) -> str:
+    """One line of a batch input file"""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": body,
+    }, ensure_ascii=False)
+
+
+def parse_output_line(line: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Parse one line of a batch output file
+
+    Returns:
+        (custom_id, parsed JSON response content or None, error message or None)
+    """
+    record = json.loads(line)
+    custom_id = record.get("custom_id", "")
+    if record.get("error"):
+        return custom_id, None, str(record["error"].get("message") or record["error"])
+
+    response = record.get("response") or {}
+    if response.get("status_code") != 200:
+        return custom_id, None, f"Request failed with status {response.get('status_code')}"
+    try:
+        content = response["body"]["choices"][0]["message"]["content"]
+        return custom_id, json.loads(content), None
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return custom_id, None, f"Unreadable response: {e}"
+
+
+class BatchLLMBackend(ABC):
+    """Submits JSONL files of chat completion requests and returns JSONL results"""
+
+    @abstractmethod
+    def submit(self, input_path: str) -> str:
+        """Submit a batch input file and return the batch ID"""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return IN_PROGRESS, COMPLETED or FAILED"""
+
+    @abstractmethod
+    def download(self, batch_id: str, output_path: str):
+        """Write the output file of a completed batch to output_path"""
+
+
+class OpenAIBatchBackend(BatchLLMBackend):
+    """OpenAI Batch API: half the price of interactive calls, separate rate limits, 24h turnaround"""
+
+    def __init__(self, client):
+        """
+        Initialize backend
+
+        Args:
+            client: Synchronous OpenAI client
+        """
+        self.client = client
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return COMPLETED
+        if batch.status in ("failed", "expired", "cancelled"):
+            return FAILED
+        return IN_PROGRESS
+
+    def download(self, batch_id: str, output_path: str):
+        batch = self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            raise Exception(f"Batch {batch_id} has no output file")
+        content = self.client.files.content(batch.output_file_id)
+        with open(output_path, "wb") as f:
+            f.write(content.read())
+
+
+def neutral_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Default local responder: a fixed, mid-range analysis for every chunk"""
+    return {
+        "out_of_context": {"assessment": "Uncertain", "explanation": "Local batch stand-in, no model was called."},
+        "propaganda": {"assessment": "Uncertain", "explanation": "Local batch stand-in, no model was called."},
+        "credibility_score": 50,
+        "content_context": "",
+        "key_concerns": [],
+        "positive_indicators": [],
+        "summary": "Local batch stand-in result.",
+    }
+
+
+class LocalBatchBackend(BatchLLMBackend):
+    """
+    File-based stand-in for the batch API
+
+    Batches are answered synchronously on submit by a responder function and
+    kept under directory, so the whole offline flow can run without network
+    access or an OpenAI account.
+    """
+
+    def __init__(self, directory: str, responder: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        Initialize backend
+
+        Args:
+            directory: Where submitted batches and their outputs are kept
+            responder: Maps a chat completion request body to the JSON content
+                of its response (defaults to neutral_response)
+        """
+        self.directory = directory
+        self.responder = responder or neutral_response
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            batch_id = "local-" + hashlib.sha256(f.read()).hexdigest()[:16]
+        batch_dir = os.path.join(self.directory, batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        shutil.copyfile(input_path, os.path.join(batch_dir, "input.jsonl"))
+
+        with open(input_path, encoding="utf-8") as src, \
+                open(os.path.join(batch_dir, "output.jsonl"), "w", encoding="utf-8") as dst:
+            for i, line in enumerate(src):
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = json.dumps(self.responder(request["body"]), ensure_ascii=False)
+                dst.write(json.dumps({
+                    "id": f"{batch_id}-{i}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]},
+                    },
+                    "error": None,
+                }, ensure_ascii=False) + "\n")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(os.path.join(self.directory, batch_id, "output.jsonl")):
+            return COMPLETED
+        return FAILED
+
+    def download(self, batch_id: str, output_path: str):
+        shutil.copyfile(os.path.join(self.directory, batch_id, "output.jsonl"), output_path)
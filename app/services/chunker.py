@@ -1,5 +1,5 @@
 import tiktoken
-from typing import List
+from typing import List, Optional, Tuple
 
 class ContentChunker:
     """Service to split large content into manageable chunks for AI analysis"""
@@ -24,85 +24,172 @@ class ContentChunker:
         """
         Split content into chunks based on token limit
 
+        Every paragraph (or, for very long paragraphs, every sentence) is
+        encoded exactly once up front. Packing then works from those token
+        counts, and overlaps are cut by slicing the accumulated token ids, so
+        chunking stays linear in document size.
+
+        Pieces are encoded separately, so their ids can differ slightly from
+        those of the joined chunk text, where tiktoken may merge a word with
+        the separator before it. Text made only of paragraphs chunks exactly
+        as re-encoding every chunk would. Once paragraphs are split into
+        sentences, an overlap may start a few characters away from where the
+        last overlap tokens of the re-encoded chunk would put it. Its token
+        count then differs a little too, so a later chunk can end one
+        sentence earlier or later.
+
         Args:
             content: The full text content to chunk
 
         Returns:
             List of text chunks
         """
-        # If content is small enough, return as single chunk
-        total_tokens = self.count_tokens(content)
-        if total_tokens <= self.max_tokens:
-            return [content]
+        return [text for text, _ in self.chunk_content_with_counts(content)]
 
+    def chunk_content_with_counts(self, content: str) -> List[Tuple[str, int]]:
+        """
+        Split content like chunk_content, also returning each chunk's token count
+
+        Args:
+            content: The full text content to chunk
+
+        Returns:
+            List of (chunk text, token count) pairs
+        """
         # Split by paragraphs first
         paragraphs = content.split('\n\n')
+        paragraph_tokens = self._encode_paragraphs(paragraphs)
+        paragraph_sep = self.encoding.encode_ordinary('\n\n')
+        sentence_sep = self.encoding.encode_ordinary('. ')
+
+        def joined_count(encoded: List[List[int]], sep: List[int]) -> int:
+            return sum(len(ids) for ids in encoded) + len(sep) * (len(encoded) - 1)
+
+        # If content is small enough, return as single chunk
+        paragraph_counts = [
+            joined_count(encoded, sentence_sep) if sentences is not None else len(encoded[0])
+            for sentences, encoded in paragraph_tokens
+        ]
+        total_tokens = sum(paragraph_counts) + len(paragraph_sep) * (len(paragraphs) - 1)
+        if total_tokens <= self.max_tokens:
+            return [(content, total_tokens)]
+
+        # What is left of each separator once a saved chunk is stripped
+        paragraph_end = []
+        sentence_end = self.encoding.encode_ordinary('.')
+
         chunks = []
         current_chunk = ""
+        current_ids = []       # Token ids of current_chunk, used to cut the next overlap
+        current_sep = []       # Separator ids trailing current_ids
+        current_end = []       # ... and what stripping the chunk text leaves of them
         current_tokens = 0
+        last_ids = []
 
-        for paragraph in paragraphs:
-            paragraph_tokens = self.count_tokens(paragraph)
+        def save_chunk():
+            nonlocal last_ids
+            chunks.append((current_chunk.strip(), current_tokens))
+            last_ids = current_ids[:len(current_ids) - len(current_sep)] + current_end
 
+        for paragraph, (sentences, encoded), paragraph_count in zip(paragraphs, paragraph_tokens, paragraph_counts):
             # If single paragraph exceeds max_tokens, split it further
-            if paragraph_tokens > self.max_tokens:
+            if paragraph_count > self.max_tokens:
+                if sentences is None:
+                    sentences = paragraph.split('. ')
+                    encoded = self.encoding.encode_ordinary_batch(sentences)
+
                 # If we have accumulated content, save it
                 if current_chunk:
-                    chunks.append(current_chunk.strip())
+                    save_chunk()
                     current_chunk = ""
+                    current_ids = []
                     current_tokens = 0
 
                 # Split long paragraph by sentences
-                sentences = paragraph.split('. ')
-                for sentence in sentences:
-                    sentence_tokens = self.count_tokens(sentence)
+                for sentence, sentence_ids in zip(sentences, encoded):
+                    sentence_tokens = len(sentence_ids)
 
                     if current_tokens + sentence_tokens > self.max_tokens:
                         if current_chunk:
-                            chunks.append(current_chunk.strip())
+                            save_chunk()
 
                         # Start new chunk with overlap from previous
                         if chunks and self.overlap > 0:
-                            overlap_text = self._get_overlap_text(chunks[-1])
+                            overlap_text, overlap_ids = self._get_overlap(chunks[-1][0], last_ids)
                             current_chunk = overlap_text + sentence + '. '
-                            current_tokens = self.count_tokens(current_chunk)
+                            current_ids = overlap_ids + paragraph_sep + sentence_ids + sentence_sep
+                            current_tokens = len(current_ids)
                         else:
                             current_chunk = sentence + '. '
+                            current_ids = sentence_ids + sentence_sep
                             current_tokens = sentence_tokens
                     else:
                         current_chunk += sentence + '. '
+                        current_ids += sentence_ids + sentence_sep
                         current_tokens += sentence_tokens
+                    current_sep, current_end = sentence_sep, sentence_end
             else:
+                # A paragraph pre-split by size that still fits is put back together, separators included
+                paragraph_ids = list(encoded[0])
+                for ids in encoded[1:]:
+                    paragraph_ids += sentence_sep + ids
+
                 # Check if adding this paragraph exceeds limit
-                if current_tokens + paragraph_tokens > self.max_tokens:
+                if current_tokens + paragraph_count > self.max_tokens:
                     # Save current chunk
                     if current_chunk:
-                        chunks.append(current_chunk.strip())
+                        save_chunk()
 
                     # Start new chunk with overlap
                     if chunks and self.overlap > 0:
-                        overlap_text = self._get_overlap_text(chunks[-1])
+                        overlap_text, overlap_ids = self._get_overlap(chunks[-1][0], last_ids)
                         current_chunk = overlap_text + paragraph + '\n\n'
-                        current_tokens = self.count_tokens(current_chunk)
+                        current_ids = overlap_ids + paragraph_sep + paragraph_ids + paragraph_sep
+                        current_tokens = len(current_ids)
                     else:
                         current_chunk = paragraph + '\n\n'
-                        current_tokens = paragraph_tokens
+                        current_ids = paragraph_ids + paragraph_sep
+                        current_tokens = paragraph_count
                 else:
                     current_chunk += paragraph + '\n\n'
-                    current_tokens += paragraph_tokens
+                    current_ids += paragraph_ids + paragraph_sep
+                    current_tokens += paragraph_count
+                current_sep, current_end = paragraph_sep, paragraph_end
 
         # Add final chunk
         if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+            chunks.append((current_chunk.strip(), current_tokens))
 
         return chunks
 
-    def _get_overlap_text(self, previous_chunk: str) -> str:
-        """Get the last portion of a chunk for overlap"""
-        tokens = self.encoding.encode(previous_chunk)
-        if len(tokens) <= self.overlap:
-            return previous_chunk + '\n\n'
+    def _encode_paragraphs(self, paragraphs: List[str]) -> List[Tuple[Optional[List[str]], List[List[int]]]]:
+        """
+        Encode each paragraph once, in a single batch
+
+        Paragraphs whose UTF-8 size exceeds max_tokens might need splitting,
+        so they are encoded sentence by sentence instead (a token is at least
+        one byte, so anything smaller can never be oversized). Returns
+        (sentences or None, token ids per piece) for every paragraph.
+        """
+        pieces = []
+        layout = []
+        for paragraph in paragraphs:
+            if len(paragraph.encode('utf-8')) > self.max_tokens:
+                sentences = paragraph.split('. ')
+                layout.append((sentences, len(pieces), len(sentences)))
+                pieces.extend(sentences)
+            else:
+                layout.append((None, len(pieces), 1))
+                pieces.append(paragraph)
+
+        encoded = self.encoding.encode_ordinary_batch(pieces) if pieces else []
+        return [(sentences, encoded[start:start + count]) for sentences, start, count in layout]
+
+    def _get_overlap(self, previous_chunk: str, previous_ids: List[int]) -> Tuple[str, List[int]]:
+        """Get the last portion of a chunk for overlap, sliced from its token ids"""
+        if len(previous_ids) <= self.overlap:
+            return previous_chunk + '\n\n', list(previous_ids)
 
-        overlap_tokens = tokens[-self.overlap:]
-        overlap_text = self.encoding.decode(overlap_tokens)
-        return overlap_text + '\n\n'
+        overlap_ids = previous_ids[-self.overlap:]
+        overlap_text = self.encoding.decode(overlap_ids)
+        return overlap_text + '\n\n', overlap_ids
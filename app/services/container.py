@@ -0,0 +1,50 @@
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from .scraper import WebScraper
+from .chunker import ContentChunker
+from .analyzer import ContentAnalyzer
+from .llm_cache import get_llm_cache, close_llm_cache
+
+
+class ServiceContainer:
+    """Long-lived services shared by every request, built once per process"""
+
+    def __init__(self):
+        self.scraper = WebScraper()
+        self.chunker = ContentChunker()
+        self._analyzer: Optional[ContentAnalyzer] = None
+        self._analyzer_error: Optional[Exception] = None
+
+        try:
+            self._analyzer = ContentAnalyzer()
+        except ValueError as e:
+            # Keep serving (health checks, stored analyses) without an API key
+            self._analyzer_error = e
+
+    @property
+    def analyzer(self) -> ContentAnalyzer:
+        if self._analyzer is None:
+            raise self._analyzer_error
+        return self._analyzer
+
+    def warm(self):
+        """Pay one-off setup costs before the first request arrives"""
+        self.chunker.count_tokens("warm up")
+        get_llm_cache()
+
+    async def close(self):
+        """Release HTTP connection pools and cache handles"""
+        await self.scraper.close()
+        if self._analyzer is not None:
+            await self._analyzer.close()
+        close_llm_cache()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """Dependency for getting the application's service container"""
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise HTTPException(status_code=503, detail="Services are not initialized")
+    return services
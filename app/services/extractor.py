@@ -0,0 +1,271 @@
+from lxml import etree
+from typing import Dict, List, Optional
+import codecs
+import re
+
+# Elements whose whole subtree is dropped
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'header', 'head'}
+
+# Elements that start and end on their own line
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'aside', 'ul', 'ol', 'li', 'dl', 'dt', 'dd',
+    'blockquote', 'pre', 'table', 'tr', 'figure', 'figcaption', 'form', 'address',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr',
+}
+
+EMPHASIS_MARKERS = {'b': '**', 'strong': '**', 'i': '_', 'em': '_'}
+
+CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+NON_ASCII_PATTERN = re.compile(rb'[\x80-\xff]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+# Bytes searched for a <meta charset> before the parser is created
+SNIFF_SIZE = 4096
+# Bytes from the first non-ASCII byte on that must decode as UTF-8 for it to be chosen
+UTF8_CHECK_SIZE = 1024
+
+
+class _MarkdownTarget:
+    """lxml parser target that turns start/end/data events into markdown-ish text"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.skip_depth = 0
+        self.pre_depth = 0
+        self.lists: List[List] = []          # [tag, next item number]
+        self.links: List[Optional[str]] = []  # href of each open <a>, None if not rendered
+        self.cells_in_row = 0
+
+        # Page metadata, collected in the same pass
+        self.title: Optional[str] = None
+        self.description: Optional[str] = None
+        self.canonical_url: Optional[str] = None
+        self._title_parts: Optional[List[str]] = None
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        if tag == 'title' and self.title is None and self._title_parts is None:
+            self._title_parts = []
+        elif tag == 'meta':
+            self._read_meta(attrib)
+        elif tag == 'link' and self.canonical_url is None:
+            if 'canonical' in attrib.get('rel', '').lower().split() and attrib.get('href'):
+                self.canonical_url = attrib['href'].strip()
+
+        if self.skip_depth or tag in SKIP_TAGS:
+            self.skip_depth += 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+        if tag[0] == 'h' and tag[1:].isdigit():
+            self.parts.append('#' * int(tag[1:]) + ' ')
+        elif tag in ('ul', 'ol'):
+            self.lists.append([tag, 1])
+        elif tag == 'li':
+            if self.lists and self.lists[-1][0] == 'ol':
+                self.parts.append(f'{self.lists[-1][1]}. ')
+                self.lists[-1][1] += 1
+            else:
+                self.parts.append('* ')
+        elif tag == 'blockquote':
+            self.parts.append('> ')
+        elif tag == 'pre':
+            self.pre_depth += 1
+        elif tag == 'hr':
+            self.parts.append('* * *')
+        elif tag == 'tr':
+            self.cells_in_row = 0
+        elif tag in ('td', 'th'):
+            if self.cells_in_row:
+                self.parts.append('| ')
+            self.cells_in_row += 1
+        elif tag == 'a':
+            href = attrib.get('href')
+            if href and not href.startswith('#'):
+                self.links.append(href)
+                self.parts.append('[')
+            else:
+                self.links.append(None)
+        elif tag in EMPHASIS_MARKERS:
+            self.parts.append(EMPHASIS_MARKERS[tag])
+        elif tag == 'code' and not self.pre_depth:
+            self.parts.append('`')
+
+    def end(self, tag: str):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = WHITESPACE_PATTERN.sub(' ', ''.join(self._title_parts)).strip()
+            self._title_parts = None
+
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+
+        if tag in ('ul', 'ol') and self.lists:
+            self.lists.pop()
+        elif tag == 'pre' and self.pre_depth:
+            self.pre_depth -= 1
+        elif tag == 'a' and self.links:
+            href = self.links.pop()
+            if href is not None:
+                self.parts.append(f']({href})')
+        elif tag in EMPHASIS_MARKERS:
+            self.parts.append(EMPHASIS_MARKERS[tag])
+        elif tag == 'code' and not self.pre_depth:
+            self.parts.append('`')
+
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def data(self, data: str):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self.skip_depth:
+            return
+        data = data.replace('\xa0', ' ')
+        if self.pre_depth:
+            self.parts.append(data)
+            return
+
+        data = WHITESPACE_PATTERN.sub(' ', data)
+        if data.startswith(' ') and self.parts and self.parts[-1][-1:] in (' ', '\n'):
+            data = data[1:]
+        if data:
+            self.parts.append(data)
+
+    def comment(self, text: str):
+        pass
+
+    def close(self) -> str:
+        text = ''.join(self.parts)
+        self.parts = []
+
+        # Clean up excessive whitespace
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        return '\n'.join(lines)
+
+    def _read_meta(self, attrib: Dict[str, str]):
+        name = (attrib.get('name') or attrib.get('property') or '').lower()
+        content = (attrib.get('content') or '').strip()
+        if not content:
+            return
+        # Prefer the plain description, fall back to Open Graph
+        if name == 'description':
+            self.description = content
+        elif name == 'og:description' and self.description is None:
+            self.description = content
+
+    def _newline(self):
+        if self.parts and self.parts[-1] != '\n':
+            self.parts.append('\n')
+
+
+class HTMLTextExtractor:
+    """
+    Single-pass HTML to markdown-ish text extractor
+
+    Bytes can be fed incrementally as they arrive. lxml's C parser emits
+    events straight into the target above, so no document tree is built,
+    unwanted elements (script, style, nav, footer, header) are dropped as
+    they stream past, and no intermediate copies of the page are kept.
+    The title, meta description and canonical link are picked up in the
+    same pass.
+    """
+
+    def __init__(self, encoding: Optional[str] = None):
+        """
+        Initialize extractor
+
+        Args:
+            encoding: Character encoding from the HTTP headers; if omitted it is
+                taken from a <meta charset> in the first SNIFF_SIZE bytes, else
+                detected from the first non-ASCII bytes (UTF-8 if they decode
+                as UTF-8, otherwise windows-1252)
+        """
+        self.encoding = encoding
+        self._target = _MarkdownTarget()
+        self._parser = None
+        self._pending = bytearray()  # Held back until the encoding is known
+
+    def feed(self, data: bytes):
+        if not data:
+            return
+        if self._parser is None:
+            self._pending += data
+            encoding = self._sniff_encoding(final=False)
+            if encoding is None:
+                return
+            self._start(encoding)
+            data, self._pending = bytes(self._pending), bytearray()
+        self._parser.feed(data)
+
+    def close(self) -> str:
+        """Finish parsing and return the extracted text"""
+        if self._parser is None:
+            if not self._pending:
+                return ''
+            self._start(self._sniff_encoding(final=True))
+            self._parser.feed(bytes(self._pending))
+            self._pending = bytearray()
+        return self._parser.close()
+
+    def _sniff_encoding(self, final: bool) -> Optional[str]:
+        """
+        Encoding of the held back bytes: '' leaves it to libxml2, None means more are needed
+
+        libxml2 reads undeclared HTML as Latin-1, which garbles UTF-8, so it
+        is only trusted to detect byte order marks.
+        """
+        if self.encoding:
+            return self.encoding
+        data = self._pending
+        if data.startswith(BOMS):
+            return ''
+        if len(data) < SNIFF_SIZE and not final:
+            return None
+
+        match = CHARSET_PATTERN.search(data, 0, SNIFF_SIZE)
+        if match:
+            return match.group(1).decode('ascii')
+
+        # Undeclared: hold ASCII back until a byte tells UTF-8 and windows-1252 apart
+        non_ascii = NON_ASCII_PATTERN.search(data)
+        if non_ascii is None:
+            return 'utf-8' if final else None
+        start = non_ascii.start()
+        sample_ends_data = start + UTF8_CHECK_SIZE >= len(data)
+        if sample_ends_data and not final:
+            return None
+        try:
+            # Incremental, so a character cut off at the end of the sample is no error
+            sample = bytes(data[start:start + UTF8_CHECK_SIZE])
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=sample_ends_data)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'windows-1252'
+
+    def _start(self, encoding: str):
+        try:
+            self._parser = etree.HTMLParser(target=self._target, encoding=encoding or None)
+        except LookupError:
+            self._parser = etree.HTMLParser(target=self._target, encoding='utf-8')
+
+    @property
+    def title(self) -> Optional[str]:
+        return self._target.title
+
+    @property
+    def description(self) -> Optional[str]:
+        return self._target.description
+
+    @property
+    def canonical_url(self) -> Optional[str]:
+        return self._target.canonical_url
+
+
+def extract_text(html: bytes, encoding: Optional[str] = None) -> str:
+    """Extract markdown-ish text from a complete HTML document"""
+    extractor = HTMLTextExtractor(encoding)
+    extractor.feed(html)
+    return extractor.close()
@@ -0,0 +1,136 @@
+from typing import List, Optional, Set, Tuple
+import asyncio
+import os
+import time
+
+from .container import ServiceContainer
+from .pipeline import fail_pending, run_analysis, record_outcome
+from .profiling import analysis_profiler
+from .timings import collect
+
+# Stored on analyses that were still queued or running when their worker went away
+INTERRUPTED_MESSAGE = "The analysis was interrupted by a server restart. Please try again."
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class AnalysisJobQueue:
+    """In-process worker pool that runs analyses in the background"""
+
+    def __init__(self, num_workers: Optional[int] = None, max_size: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        Initialize job queue
+
+        Args:
+            num_workers: Number of concurrent worker tasks
+                (defaults to ANALYSIS_WORKERS, or 4)
+            max_size: Maximum number of queued jobs before submissions are rejected
+                (defaults to ANALYSIS_QUEUE_SIZE, or 100)
+            timeout: Seconds an analysis may run before it is failed; pending rows
+                older than this at startup are treated as abandoned
+                (defaults to ANALYSIS_TIMEOUT, or 900)
+        """
+        self.num_workers = num_workers or int(os.getenv("ANALYSIS_WORKERS", "4"))
+        self.max_size = max_size or int(os.getenv("ANALYSIS_QUEUE_SIZE", "100"))
+        self.timeout = timeout or float(os.getenv("ANALYSIS_TIMEOUT", "900"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._services: Optional[ServiceContainer] = None
+        # Submitted jobs whose outcome has not been recorded yet
+        self._unfinished: Set[int] = set()
+
+    def start(self, services: ServiceContainer):
+        """Spawn worker tasks on the running event loop"""
+        if self._workers:
+            return
+        self._services = services
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"analysis-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    async def stop(self):
+        """Cancel worker tasks and fail the jobs they had not finished"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+        unfinished, self._unfinished = self._unfinished, set()
+        try:
+            await fail_pending(INTERRUPTED_MESSAGE, request_ids=unfinished)
+        except Exception as e:
+            print(f"Could not fail {len(unfinished)} interrupted analyses: {e}")
+
+    async def fail_abandoned(self):
+        """
+        Fail pending analyses left behind by a process that died without stopping
+
+        Only single analyses older than timeout are touched: any queue would
+        have finished or timed them out by then, so none of them can still be
+        running in another worker process. Batch rows are left alone, since a
+        large batch legitimately keeps URLs pending for hours in whichever
+        process accepted it.
+        """
+        try:
+            failed = await fail_pending(INTERRUPTED_MESSAGE, older_than=self.timeout, include_batches=False)
+        except Exception as e:
+            print(f"Could not fail abandoned analyses: {e}")
+            return
+        if failed:
+            print(f"Marked {failed} abandoned analyses as failed")
+
+    def submit(self, request_id: int, url: str, profile: bool = False):
+        """
+        Enqueue an analysis for a pending AnalysisRequest row
+
+        Args:
+            request_id: ID of the pending database record
+            url: The website URL to analyze
+            profile: Run the analysis under the sampling profiler
+        """
+        if self._queue is None:
+            raise JobQueueFull("Job queue is not running")
+        try:
+            self._queue.put_nowait((request_id, url, time.time(), profile))
+        except asyncio.QueueFull:
+            raise JobQueueFull("Too many analyses in progress. Please try again shortly.")
+        self._unfinished.add(request_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                print(f"Analysis job {job[0]} could not be recorded: {e}")
+            else:
+                self._unfinished.discard(job[0])
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Tuple[int, str, float, bool]):
+        request_id, url, start_time, profile = job
+
+        profile_run = analysis_profiler.start() if profile else None
+        # record_outcome stores the timings collected so far
+        with collect():
+            try:
+                final_result, scrape = await asyncio.wait_for(run_analysis(url, self._services, request_id), self.timeout)
+            except asyncio.TimeoutError:
+                await record_outcome(request_id, start_time, error=Exception("Analysis timed out. Please try again."))
+            except Exception as e:
+                await record_outcome(request_id, start_time, error=e)
+            else:
+                await record_outcome(request_id, start_time, final_result, scrape)
+
+        if profile_run is not None:
+            await analysis_profiler.save(profile_run, request_id)
+
+
+job_queue = AnalysisJobQueue()
@@ -0,0 +1,165 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import record_cache_lookup
+
+# Lazy initialization - don't open the cache file until needed
+_llm_cache = None
+
+# last_used updates from hits are written together once this many are pending, or this old
+TOUCH_BATCH_SIZE = 64
+TOUCH_FLUSH_INTERVAL = 5.0
+
+# Writes between re-reading the total size, which other processes sharing the file change too
+SIZE_SYNC_INTERVAL = 100
+
+
+class LLMResponseCache:
+    """
+    Content-addressed on-disk cache of LLM JSON responses backed by SQLite
+
+    Calls block on disk I/O; async code should run them in a thread. Hits
+    only read: their last_used updates are queued and written in one
+    statement per TOUCH_BATCH_SIZE hits or TOUCH_FLUSH_INTERVAL seconds.
+    The file may be shared by several worker processes, so the total size is
+    re-read from the table before evicting and every SIZE_SYNC_INTERVAL
+    writes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite database file
+            max_bytes: Total size of stored responses before least recently
+                used entries are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.monotonic()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._total_bytes = self._stored_bytes()
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, kind: str, text: str) -> str:
+        """Hash the inputs that determine an LLM response"""
+        payload = json.dumps([model, prompt_version, kind, text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                record_cache_lookup("llm", False)
+                return None
+            self.hits += 1
+            record_cache_lookup("llm", True)
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH_SIZE or time.monotonic() - self._touched_since >= TOUCH_FLUSH_INTERVAL:
+                self._flush_touched()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time())
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._writes += 1
+            if self._writes % SIZE_SYNC_INTERVAL == 0 or self._total_bytes > self.max_bytes:
+                self._total_bytes = self._stored_bytes()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+        self._touched_since = time.monotonic()
+
+    def _evict(self):
+        # Recent hits must count before picking the least recently used entries
+        self._flush_touched()
+        # Drop least recently used entries until we are back under 90% of the limit
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the shared cache, or None if LLM_CACHE_PATH is set to an empty string"""
+    global _llm_cache
+    if _llm_cache is None:
+        path = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+        if path:
+            max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+            _llm_cache = LLMResponseCache(path, max_bytes)
+    return _llm_cache
+
+
+def close_llm_cache():
+    """Close the shared cache; the next get_llm_cache() reopens it"""
+    global _llm_cache
+    if _llm_cache is not None:
+        _llm_cache.close()
+        _llm_cache = None
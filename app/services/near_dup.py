@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import os
+import re
+import struct
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import AnalysisDetail, AnalysisRequest, ContentFingerprint, FingerprintBand
+
+WORD_PATTERN = re.compile(r'\w+')
+MAX_HASH = (1 << 64) - 1
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index for spotting syndicated copies of already analyzed pages
+
+    Text is split into overlapping word shingles and summarized by a MinHash
+    signature, whose matching positions estimate the Jaccard similarity of the
+    shingle sets. Signatures use one-permutation hashing (one hash per shingle,
+    binned into num_perm buckets) so fingerprinting a page is a single pass.
+
+    Each signature is cut into bands; pages sharing any band are candidates,
+    found through an indexed lookup on band keys rather than a scan, and only
+    those few candidates have their similarity estimated. With 16 bands of 8
+    rows, pages at 0.9 similarity collide in some band over 99.9% of the time,
+    pages below 0.5 well under 10%.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, max_age: Optional[int] = None,
+                 num_perm: int = 128, bands: int = 16, shingle_size: int = 5):
+        """
+        Initialize index
+
+        Args:
+            threshold: Estimated similarity (0-1) at which an earlier analysis
+                is reused; 0 disables detection (defaults to NEAR_DUP_THRESHOLD, or 0.9)
+            max_age: Seconds an analysis stays eligible for reuse
+                (defaults to NEAR_DUP_MAX_AGE, or 7 days)
+            num_perm: MinHash signature length
+            bands: LSH bands; num_perm must be divisible by it
+            shingle_size: Words per shingle
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))
+        self.max_age = max_age if max_age is not None else int(os.getenv("NEAR_DUP_MAX_AGE", str(7 * 24 * 3600)))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Candidates examined per lookup, most recent first
+        self.max_candidates = 20
+        self._format = f'<{num_perm}Q'
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """MinHash signature of text, or None if it is too short to fingerprint reliably"""
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < self.shingle_size * 10:
+            return None
+
+        num_perm = self.num_perm
+        bins = [MAX_HASH] * num_perm
+        for i in range(len(words) - self.shingle_size + 1):
+            h = _hash64(' '.join(words[i:i + self.shingle_size]).encode('utf-8'))
+            bucket = h % num_perm
+            value = h // num_perm
+            if value < bins[bucket]:
+                bins[bucket] = value
+
+        # Densify: an empty bin borrows the next filled bin to its right, offset
+        # by the distance so borrowed values are consistent across documents
+        if MAX_HASH in bins:
+            original = list(bins)
+            offset = MAX_HASH // num_perm
+            for i in range(num_perm):
+                if original[i] == MAX_HASH:
+                    distance = next(d for d in range(1, num_perm) if original[(i + d) % num_perm] != MAX_HASH)
+                    bins[i] = (original[(i + distance) % num_perm] + distance * offset) & MAX_HASH
+        return bins
+
+    def similarity(self, a: List[int], b: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_perm
+
+    def band_keys(self, signature: List[int]) -> List[int]:
+        """One signed 64-bit key per band, as stored in fingerprint_bands"""
+        keys = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            data = bytes([band]) + struct.pack(f'<{self.rows}Q', *values)
+            keys.append(_hash64(data) - (1 << 63))
+        return keys
+
+    async def lookup(self, db: AsyncSession, signature: List[int]) -> Optional[Tuple[int, Dict[str, Any], float]]:
+        """
+        Find a recent completed analysis of near-identical text
+
+        Returns:
+            (source request id, detailed results, estimated similarity) or None
+        """
+        if not self.enabled:
+            return None
+
+        candidate_ids = list(await db.scalars(
+            select(FingerprintBand.request_id)
+            .where(FingerprintBand.band_key.in_(self.band_keys(signature)))
+            .distinct()
+            .order_by(FingerprintBand.request_id.desc())
+            .limit(self.max_candidates)
+        ))
+        if not candidate_ids:
+            return None
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        candidates = await db.execute(
+            select(ContentFingerprint.request_id, ContentFingerprint.signature)
+            .join(AnalysisRequest, AnalysisRequest.id == ContentFingerprint.request_id)
+            .where(
+                ContentFingerprint.request_id.in_(candidate_ids),
+                AnalysisRequest.status == "completed",
+                AnalysisRequest.requested_at >= cutoff,
+            )
+        )
+
+        best = None
+        for request_id, packed in candidates:
+            score = self.similarity(signature, list(struct.unpack(self._format, packed)))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (request_id, score)
+        if best is None:
+            return None
+
+        # Only the winner's results are read
+        detail = await db.get(AnalysisDetail, best[0])
+        if detail is None or not detail.results:
+            return None
+        return best[0], detail.results, best[1]
+
+    async def add(self, db: AsyncSession, request_id: int, signature: List[int]):
+        """Index the signature of a completed analysis; the caller commits"""
+        await db.execute(
+            insert(ContentFingerprint).values(request_id=request_id, signature=struct.pack(self._format, *signature))
+        )
+        # One multi-row statement for all bands
+        await db.execute(
+            insert(FingerprintBand),
+            [{"band_key": key, "request_id": request_id} for key in self.band_keys(signature)]
+        )
+
+
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,287 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import asyncio
+import time
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_session_local
+from ..models import AnalysisDetail, AnalysisRequest
+from .container import ServiceContainer
+from .metrics import analyses_in_flight, chunks_per_analysis, record_cache_lookup
+from .near_dup import near_duplicates
+from .progress import progress
+from .scraper import ScrapeResult
+from .timings import current as current_timings, record, stage
+from .url_cache import result_cache
+
+
+async def run_analysis(url: str, services: ServiceContainer,
+                       request_id: Optional[int] = None) -> Tuple[Dict[str, Any], ScrapeResult]:
+    """
+    Run the scrape -> chunk -> analyze -> aggregate pipeline for a URL
+
+    Args:
+        url: The website URL to analyze
+        services: Shared scraper, chunker and analyzer
+        request_id: Database record to publish progress events for, if any
+
+    Returns:
+        Aggregated analysis result and the scrape it was based on
+    """
+    with analyses_in_flight.track():
+        scrape = await scrape_page(url, services, request_id)
+        final_result = await find_near_duplicate(scrape, request_id)
+        if final_result is None:
+            # Tokenizing is CPU bound; keep it off the event loop
+            chunked = await asyncio.to_thread(chunk_page, scrape, services, request_id)
+            final_result = await analyze_page(chunked, scrape, services, request_id)
+    return final_result, scrape
+
+
+async def scrape_page(url: str, services: ServiceContainer, request_id: Optional[int] = None) -> ScrapeResult:
+    """Step 1: Scrape website content"""
+    with stage("scrape"):
+        scrape = await services.scraper.fetch(url)
+    record("bytes_downloaded", scrape.bytes_downloaded)
+    record("content_truncated", scrape.truncated)
+    record("extract_seconds", scrape.extract_seconds)
+
+    if not scrape.text or len(scrape.text.strip()) < 100:
+        raise Exception("Insufficient content extracted from URL")
+
+    if request_id is not None:
+        progress.publish(request_id, "fetched", {
+            "title": scrape.title,
+            "bytes_downloaded": scrape.bytes_downloaded,
+            "content_truncated": scrape.truncated,
+        })
+    return scrape
+
+
+async def find_near_duplicate(scrape: ScrapeResult, request_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Step 1b: Reuse the analysis of a recently analyzed page with near-identical text"""
+    AsyncSessionLocal = get_async_session_local()
+    if not near_duplicates.enabled or AsyncSessionLocal is None:
+        return None
+
+    with stage("near_duplicate"):
+        scrape.signature = await asyncio.to_thread(near_duplicates.signature, scrape.text)
+        if scrape.signature is None:
+            return None
+
+        async with AsyncSessionLocal() as db:
+            match = await near_duplicates.lookup(db, scrape.signature)
+    record_cache_lookup("near_duplicate", match is not None)
+    if match is None:
+        return None
+
+    source_request_id, detailed_results, similarity = match
+    final_result = dict(detailed_results)
+    final_result["near_duplicate_of"] = {"request_id": source_request_id, "similarity": round(similarity, 3)}
+    final_result["content_truncated"] = scrape.truncated
+    final_result["bytes_downloaded"] = scrape.bytes_downloaded
+
+    if request_id is not None:
+        progress.publish(request_id, "near_duplicate", final_result["near_duplicate_of"])
+    return final_result
+
+
+def chunk_page(scrape: ScrapeResult, services: ServiceContainer,
+               request_id: Optional[int] = None) -> List[Tuple[str, int]]:
+    """Step 2: Chunk the content into (text, token count) pairs"""
+    with stage("chunk"):
+        chunked = services.chunker.chunk_content_with_counts(scrape.text)
+    chunks_per_analysis.observe(len(chunked))
+    record("chunk_count", len(chunked))
+
+    if request_id is not None:
+        progress.publish(request_id, "chunked", {"total_chunks": len(chunked)})
+    return chunked
+
+
+async def analyze_page(chunked: List[Tuple[str, int]], scrape: ScrapeResult,
+                       services: ServiceContainer, request_id: Optional[int] = None) -> Dict[str, Any]:
+    """Steps 3 and 4: Analyze all chunks concurrently and aggregate the results"""
+    chunks = [text for text, _ in chunked]
+    token_counts = [tokens for _, tokens in chunked]
+
+    on_result = None
+    if request_id is not None:
+        # Provisional findings for the UI while the other chunks are still running
+        def on_result(chunk_index: int, result: Dict[str, Any]):
+            progress.publish(request_id, "chunk", {
+                "index": chunk_index,
+                "total_chunks": len(chunks),
+                "result": result,
+            })
+
+    analyzer = services.analyzer
+    with stage("analyze"):
+        chunk_results = await analyzer.analyze_chunks(chunks, on_result)
+
+    if request_id is not None and len(chunk_results) > 1:
+        progress.publish(request_id, "aggregating", {"total_chunks": len(chunk_results)})
+
+    # Aggregate locally when the chunks agree
+    with stage("aggregate"):
+        final_result = dict(await analyzer.aggregate_results_async(chunk_results, token_counts))
+
+    # Let consumers know when only the start of an oversized page was analyzed
+    final_result["content_truncated"] = scrape.truncated
+    final_result["bytes_downloaded"] = scrape.bytes_downloaded
+    return final_result
+
+
+async def record_outcome(request_id: int, start_time: float, final_result: Optional[Dict[str, Any]] = None,
+                         scrape: Optional[ScrapeResult] = None, error: Optional[Exception] = None):
+    """Store the outcome of a background analysis on its pending database record"""
+    if error is None:
+        fields = result_fields(final_result, start_time, scrape)
+    else:
+        fields = failure_fields(error, start_time)
+    detailed_results = fields.pop("detailed_results", None)
+    # Written with the outcome, so the final write itself is only in the db_write metric
+    analysis_timings = current_timings()
+    if analysis_timings is not None:
+        fields["timings"] = analysis_timings.as_dict()
+
+    with stage("db_write"):
+        async with get_async_session_local()() as db:
+            # UPDATE ... RETURNING instead of loading the row first
+            row = (await db.execute(
+                update(AnalysisRequest)
+                .where(AnalysisRequest.id == request_id)
+                .values(**fields)
+                .returning(AnalysisRequest.normalized_url)
+            )).first()
+            if row is None:
+                return
+            if detailed_results is not None:
+                await db.execute(insert(AnalysisDetail).values(request_id=request_id, results=detailed_results))
+            if error is None and fields.get("source_request_id") is None:
+                await index_fingerprint(db, request_id, scrape)
+            await db.commit()
+
+    if error is None:
+        result_cache.store(row.normalized_url, fields.get("source_request_id") or request_id, final_result)
+    publish_outcome(request_id, fields.get("error_message"))
+
+
+async def fail_pending(message: str, request_ids: Optional[Iterable[int]] = None,
+                       older_than: Optional[float] = None, include_batches: bool = True) -> int:
+    """
+    Mark pending analyses as failed so clients polling them get an answer
+
+    Args:
+        message: Error message stored on each record
+        request_ids: Only fail these records
+        older_than: Only fail records requested more than this many seconds ago
+        include_batches: Whether records belonging to a batch submission are failed too
+
+    Returns:
+        Number of records failed
+    """
+    query = update(AnalysisRequest).where(AnalysisRequest.status == "pending")
+    if request_ids is not None:
+        request_ids = list(request_ids)
+        if not request_ids:
+            return 0
+        query = query.where(AnalysisRequest.id.in_(request_ids))
+    if older_than is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+        query = query.where(AnalysisRequest.requested_at < cutoff)
+    if not include_batches:
+        query = query.where(AnalysisRequest.batch_id.is_(None))
+
+    async with get_async_session_local()() as db:
+        failed = (await db.execute(
+            query.values(status="failed", error_message=message).returning(AnalysisRequest.id)
+        )).scalars().all()
+        await db.commit()
+
+    for request_id in failed:
+        publish_outcome(request_id, message)
+    return len(failed)
+
+
+def publish_outcome(request_id: int, error_message: Optional[str] = None):
+    """Tell progress subscribers that a committed analysis has finished"""
+    if error_message is not None:
+        progress.publish(request_id, "failed", {"error": error_message})
+    else:
+        progress.publish(request_id, "completed", {"status": "completed"})
+
+
+def result_fields(final_result: Dict[str, Any], start_time: float,
+                  scrape: Optional[ScrapeResult] = None) -> Dict[str, Any]:
+    """Column values for a completed analysis, including page metadata if given"""
+    fields = {
+        "status": "completed",
+        "is_out_of_context": final_result.get("out_of_context", {}).get("assessment", "Uncertain"),
+        "is_propaganda": final_result.get("propaganda", {}).get("assessment", "Uncertain"),
+        "credibility_score": final_result.get("credibility_score", 0),
+        "content_context": final_result.get("content_context", ""),
+        "detailed_results": final_result,
+        "analysis_duration": time.time() - start_time,
+    }
+
+    # Served from an earlier analysis of a syndicated copy of the page
+    near_duplicate_of = final_result.get("near_duplicate_of")
+    if near_duplicate_of:
+        fields["source_request_id"] = near_duplicate_of["request_id"]
+
+    if scrape is not None:
+        fields.update(
+            page_title=scrape.title[:1024],
+            page_description=scrape.description,
+            canonical_url=(scrape.canonical_url or "")[:2048] or None,
+            final_url=(scrape.final_url or "")[:2048] or None,
+            response_headers=scrape.headers,
+        )
+    return fields
+
+
+def failure_fields(error: Exception, start_time: float) -> Dict[str, Any]:
+    """Column values for a failed analysis"""
+    return {
+        "status": "failed",
+        "error_message": str(error),
+        "analysis_duration": time.time() - start_time,
+    }
+
+
+def apply_result(analysis_request: AnalysisRequest, final_result: Dict[str, Any], start_time: float,
+                 scrape: Optional[ScrapeResult] = None):
+    """Copy an aggregated result, and the page metadata if given, onto its database record"""
+    for name, value in result_fields(final_result, start_time, scrape).items():
+        setattr(analysis_request, name, value)
+
+
+async def index_fingerprint(db: AsyncSession, request_id: int, scrape: Optional[ScrapeResult]):
+    """Make a fresh analysis findable by near-duplicate detection; the caller commits"""
+    if scrape is None:
+        return
+    signature = scrape.signature or await asyncio.to_thread(near_duplicates.signature, scrape.text)
+    if signature is not None:
+        await near_duplicates.add(db, request_id, signature)
+
+
+def apply_cached_result(analysis_request: AnalysisRequest, source_request_id: int,
+                        final_result: Dict[str, Any], start_time: float):
+    """
+    Fill a database record from a previous analysis of the same URL
+
+    The detailed results are not copied; they are read from the source record.
+    """
+    for name, value in result_fields(final_result, start_time).items():
+        if name != "detailed_results":
+            setattr(analysis_request, name, value)
+    analysis_request.source_request_id = source_request_id
+
+
+def apply_failure(analysis_request: AnalysisRequest, error: Exception, start_time: float):
+    """Mark a database record as failed"""
+    for name, value in failure_fields(error, start_time).items():
+        setattr(analysis_request, name, value)
@@ -0,0 +1,71 @@
+from typing import Optional
+import asyncio
+import hmac
+import os
+
+try:
+    from pyinstrument import Profiler  # Sampling profiler, only needed when profiling is enabled
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+# Header that asks for a single analysis to be profiled; its value must equal PROFILING_TOKEN
+PROFILE_HEADER = "X-Profile-Token"
+
+
+class AnalysisProfiler:
+    """
+    Opt-in sampling profiles of individual analyses
+
+    A request carrying PROFILE_HEADER with the configured token has its
+    pipeline run under pyinstrument, and the rendered HTML profile is
+    kept under directory for download by request ID. Without a token
+    configured, or without pyinstrument installed, the header is ignored.
+    """
+
+    def __init__(self, token: Optional[str] = None, directory: Optional[str] = None):
+        """
+        Initialize profiler
+
+        Args:
+            token: Secret that callers must present (defaults to PROFILING_TOKEN; empty disables profiling)
+            directory: Where profiles are written (defaults to PROFILE_DIR, or data/profiles)
+        """
+        self.token = token if token is not None else os.getenv("PROFILING_TOKEN", "")
+        self.directory = directory or os.getenv("PROFILE_DIR", "data/profiles")
+
+        if self.token and not PYINSTRUMENT_AVAILABLE:
+            print("PROFILING_TOKEN is set but pyinstrument is not installed; profiling is disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) and PYINSTRUMENT_AVAILABLE
+
+    def authorized(self, presented: Optional[str]) -> bool:
+        """Whether a caller presented the profiling token"""
+        # compare_digest only takes ASCII strings; a header with other characters must get a 403, not a TypeError
+        return self.enabled and bool(presented) and hmac.compare_digest(presented.encode(), self.token.encode())
+
+    def start(self):
+        """Start sampling the current task; pass the result to save()"""
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    async def save(self, profiler, request_id: int):
+        """Stop a profiler and write its HTML report for request_id"""
+        profiler.stop()
+        # Rendering walks every sample; keep it off the event loop
+        html = await asyncio.to_thread(profiler.output_html)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(request_id), "w", encoding="utf-8") as f:
+                f.write(html)
+        except OSError as e:
+            print(f"Could not save profile of request {request_id}: {e}")
+
+    def path(self, request_id: int) -> str:
+        return os.path.join(self.directory, f"{int(request_id)}.html")
+
+
+analysis_profiler = AnalysisProfiler()
@@ -0,0 +1,133 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import os
+import threading
+import time
+
+# Events after which no more progress is published for a request
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class _Channel:
+    def __init__(self):
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []  # (id, event, data)
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.finished_at: Optional[float] = None
+        self.updated_at = time.time()
+
+
+class ProgressBroker:
+    """
+    In-process publish/subscribe hub for analysis progress events
+
+    Events are kept per request so a subscriber that connects mid-analysis
+    first gets everything published so far. Finished requests are dropped
+    after retention seconds. Unfinished ones are dropped once nothing has
+    been published for max_age seconds and nobody is subscribed, which
+    covers analyses that died without a terminal event. Expired channels
+    are swept at most every retention / 10 seconds and on every subscribe.
+    Events may be published from worker threads (chunking runs in one);
+    they are handed to each subscriber on its own event loop.
+    """
+
+    def __init__(self, retention: Optional[float] = None, max_age: Optional[float] = None):
+        """
+        Initialize broker
+
+        Args:
+            retention: Seconds to keep the events of a finished request
+                (defaults to PROGRESS_RETENTION, or 300)
+            max_age: Seconds to keep an unfinished request with no new events
+                and no subscribers (defaults to PROGRESS_MAX_AGE, or 3600)
+        """
+        self.retention = retention if retention is not None else float(os.getenv("PROGRESS_RETENTION", "300"))
+        self.max_age = max_age if max_age is not None else float(os.getenv("PROGRESS_MAX_AGE", "3600"))
+        self._channels: Dict[int, _Channel] = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def publish(self, request_id: int, event: str, data: Optional[Dict[str, Any]] = None):
+        """Record an event for a request and push it to live subscribers"""
+        data = data or {}
+        now = time.time()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            channel = self._channels.get(request_id)
+            if channel is None:
+                channel = self._channels[request_id] = _Channel()
+            if channel.finished_at is not None:
+                return
+            message = (len(channel.events) + 1, event, data)
+            channel.events.append(message)
+            channel.updated_at = now
+            if event in TERMINAL_EVENTS:
+                channel.finished_at = now
+            subscribers = list(channel.subscribers)
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for loop, queue in subscribers:
+            if loop is current_loop:
+                queue.put_nowait(message)
+            else:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def subscribe(self, request_id: int, timeout: Optional[float] = None) -> AsyncIterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+        """
+        Yield (id, event, data) for past and future events of a request
+
+        Stops after a terminal event. If timeout is given, None is yielded
+        whenever nothing arrived for that many seconds, so the caller can send
+        keep-alives or check whether the request finished elsewhere.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._prune(time.time())
+            channel = self._channels.get(request_id)
+            if channel is None:
+                channel = self._channels[request_id] = _Channel()
+            backlog = list(channel.events)
+            channel.subscribers.append(subscriber)
+
+        try:
+            for message in backlog:
+                yield message
+                if message[1] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # Skip anything already replayed from the backlog
+                if message[0] <= len(backlog):
+                    continue
+                yield message
+                if message[1] in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in channel.subscribers:
+                    channel.subscribers.remove(subscriber)
+                if not channel.events and not channel.subscribers and self._channels.get(request_id) is channel:
+                    del self._channels[request_id]
+
+    def _prune(self, now: float):
+        finished_cutoff = now - self.retention
+        stale_cutoff = now - self.max_age
+        expired = [
+            request_id for request_id, channel in self._channels.items()
+            if (channel.finished_at is not None and channel.finished_at < finished_cutoff)
+            or (channel.finished_at is None and not channel.subscribers and channel.updated_at < stale_cutoff)
+        ]
+        for request_id in expired:
+            del self._channels[request_id]
+        self._next_prune = now + self.retention / 10
+
+
+progress = ProgressBroker()
@@ -0,0 +1,120 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import time
+
+from .metrics import record_usage, stage_seconds
+
+
+class AnalysisTimings:
+    """Timing breakdown of a single analysis, stored on its AnalysisRequest row"""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.chunks: List[Dict[str, Any]] = []
+
+    def add(self, name: str, amount: float):
+        self.values[name] = self.values.get(name, 0) + amount
+
+    def set(self, name: str, value: Any):
+        self.values[name] = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        result = {
+            name: round(value, 4) if isinstance(value, float) else value
+            for name, value in self.values.items()
+        }
+        if self.chunks:
+            result["chunks"] = sorted(self.chunks, key=lambda chunk: chunk["index"])
+        return result
+
+
+# The analysis being timed by the current task, and the LLM call it is making
+_current: ContextVar[Optional[AnalysisTimings]] = ContextVar("analysis_timings", default=None)
+_call: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_call", default=None)
+
+
+@contextmanager
+def collect(timings: Optional[AnalysisTimings] = None) -> Iterator[AnalysisTimings]:
+    """
+    Attribute the stages run inside the block to timings (a new one if not given)
+
+    Context variables follow tasks spawned from the block and
+    asyncio.to_thread calls, so concurrent chunk analyses are attributed to
+    the right request.
+    """
+    timings = timings or AnalysisTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[AnalysisTimings]:
+    return _current.get()
+
+
+def record(name: str, value: Any):
+    """Set a value on the analysis being timed, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.set(name, value)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into the stage histogram and the current analysis's <name>_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(f"{name}_seconds", elapsed)
+
+
+@contextmanager
+def llm_call(chunk_index: int) -> Iterator[None]:
+    """Time the analysis of one chunk, recording its latency, tokens and whether it was cached"""
+    call = {"index": chunk_index, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cached": False}
+    token = _call.set(call)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _call.reset(token)
+        stage_seconds.observe(elapsed, stage="analyze_chunk")
+        timings = _current.get()
+        if timings is not None:
+            call["seconds"] = round(elapsed, 4)
+            timings.chunks.append(call)
+
+
+def record_llm_usage(kind: str, usage: Any):
+    """Add the token usage of an LLM call to the current request's timings and the global metrics"""
+    record_usage(kind, usage)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+    call = _call.get()
+    if call is not None:
+        call["prompt_tokens"] += prompt_tokens
+        call["completion_tokens"] += completion_tokens
+    timings = _current.get()
+    if timings is not None:
+        timings.add(f"{kind}_calls", 1)
+        timings.add(f"{kind}_prompt_tokens", prompt_tokens)
+        timings.add(f"{kind}_completion_tokens", completion_tokens)
+
+
+def record_llm_cache_hit():
+    """Mark the current chunk analysis as served from the LLM response cache"""
+    call = _call.get()
+    if call is not None:
+        call["cached"] = True
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import AnalysisDetail, AnalysisRequest
+from .metrics import record_cache_lookup
+from .timings import stage
+
+# Query parameters that only identify the referrer, never the content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid",
+    "igshid", "yclid", "_ga", "_gl", "ref_src", "cmpid",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for cache lookups
+
+    Lowercases scheme and host, drops default ports, tracking parameters
+    (utm_*, fbclid, ...) and the fragment, and sorts the remaining query.
+    """
+    url = url.strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with per-entry expiry"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class URLResultCache:
+    """Two-tier cache of completed analyses keyed by normalized URL"""
+
+    def __init__(self, ttl: Optional[int] = None, max_size: Optional[int] = None):
+        """
+        Initialize result cache
+
+        Args:
+            ttl: Seconds a completed analysis may be reused; 0 disables caching
+                (defaults to RESULT_CACHE_TTL, or 3600)
+            max_size: Number of entries in the in-memory tier
+                (defaults to RESULT_CACHE_SIZE, or 1024)
+        """
+        self.ttl = ttl if ttl is not None else int(os.getenv("RESULT_CACHE_TTL", "3600"))
+        self.memory = LRUCache(max_size if max_size is not None else int(os.getenv("RESULT_CACHE_SIZE", "1024")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def lookup(self, db: AsyncSession, normalized_url: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Find a reusable completed analysis
+
+        Args:
+            db: Database session used when the in-memory tier misses
+            normalized_url: Output of normalize_url
+
+        Returns:
+            (source request id, detailed results) or None
+        """
+        if not self.enabled:
+            return None
+
+        cached = self.memory.get(normalized_url)
+        if cached is not None:
+            record_cache_lookup("result", True)
+            return cached
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        with stage("db_read"):
+            source = (await db.execute(
+                select(AnalysisRequest.id, AnalysisRequest.requested_at, AnalysisDetail.results)
+                .join(AnalysisDetail, AnalysisDetail.request_id == AnalysisRequest.id)
+                .where(
+                    AnalysisRequest.normalized_url == normalized_url,
+                    AnalysisRequest.status == "completed",
+                    AnalysisRequest.source_request_id.is_(None),
+                    AnalysisRequest.requested_at >= cutoff,
+                )
+                .order_by(AnalysisRequest.requested_at.desc())
+                .limit(1)
+            )).first()
+        if source is None or not source.results:
+            record_cache_lookup("result", False)
+            return None
+        record_cache_lookup("result", True)
+
+        # Only keep it in memory for whatever is left of its TTL
+        remaining = self.ttl - (datetime.now(timezone.utc) - _as_utc(source.requested_at)).total_seconds()
+        cached = (source.id, source.results)
+        if remaining > 0:
+            self.memory.set(normalized_url, cached, remaining)
+        return cached
+
+    def store(self, normalized_url: str, request_id: int, final_result: Dict[str, Any]):
+        """Remember a freshly completed analysis"""
+        if self.enabled:
+            self.memory.set(normalized_url, (request_id, final_result), self.ttl)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+result_cache = URLResultCache()
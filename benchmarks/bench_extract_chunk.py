@@ -0,0 +1,209 @@
+"""
+Microbenchmarks of the CPU-bound part of an analysis: HTML text extraction
+(HTMLTextExtractor, fed in pieces as WebScraper.fetch does) and chunking
+(ContentChunker.chunk_content_with_counts), over synthetic pages from 5 KB
+to 5 MB and the saved pages in benchmarks/corpus.
+
+For each document it records the best time of --repeat runs (the least
+disturbed by other work on the machine), the peak of Python
+allocations (tracemalloc; memory held by libxml2 and tiktoken themselves
+is not seen) and, for chunking, the number of tokenizer encode calls and
+of texts encoded.
+
+Results are compared against a stored baseline, and the run fails when
+a document gets slower or uses more memory than the tolerances allow, or
+when it makes more encode calls. A run without a baseline fails too, so a
+lost baseline cannot pass the check unnoticed. Save a baseline on the
+machine that runs the comparison (timings do not carry across machines):
+    python benchmarks/bench_extract_chunk.py --save-baseline
+
+Usage:
+    python benchmarks/bench_extract_chunk.py
+    python benchmarks/bench_extract_chunk.py --sizes 5 50 500 5000 --repeat 5
+    python benchmarks/bench_extract_chunk.py --file saved_page.html --no-corpus
+    python benchmarks/bench_extract_chunk.py --time-tolerance 0.3 --baseline /tmp/baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import ContentChunker
+from app.services.extractor import HTMLTextExtractor
+# Bytes handed to the extractor at a time, as the scraper does
+from app.services.scraper import FEED_SIZE
+from pages import load_corpus, synthetic_page
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'extract_chunk.json')
+
+# Differences below these never count as regressions, whatever the tolerance
+TIME_SLACK = 0.002
+MEMORY_SLACK = 64 * 1024
+
+
+class CountingEncoding:
+    """Wraps a tiktoken Encoding, counting encode calls and the texts they encode"""
+
+    def __init__(self, encoding):
+        self._encoding = encoding
+        self.calls = 0
+        self.texts = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._encoding, name)
+        if not name.startswith('encode') or not callable(attr):
+            return attr
+
+        def counted(text, *args, **kwargs):
+            self.calls += 1
+            self.texts += len(text) if name.endswith('_batch') else 1
+            return attr(text, *args, **kwargs)
+        return counted
+
+
+def extract(html: bytes) -> str:
+    extractor = HTMLTextExtractor()
+    for start in range(0, len(html), FEED_SIZE):
+        extractor.feed(html[start:start + FEED_SIZE])
+    return extractor.close()
+
+
+def measure(func, arg, repeat: int):
+    """Return (result, best seconds, peak traced bytes)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        timings.append(time.perf_counter() - start)
+
+    # Keep the cyclic collector from moving the peak around between runs
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+    return result, min(timings), peak
+
+
+def bench_document(html: bytes, chunker: ContentChunker, repeat: int) -> dict:
+    text, extract_seconds, extract_peak = measure(extract, html, repeat)
+    chunks, chunk_seconds, chunk_peak = measure(chunker.chunk_content_with_counts, text, repeat)
+
+    encoding = chunker.encoding
+    counting = chunker.encoding = CountingEncoding(encoding)
+    try:
+        chunker.chunk_content_with_counts(text)
+    finally:
+        chunker.encoding = encoding
+
+    return {
+        'html_bytes': len(html),
+        'text_chars': len(text),
+        'extract': {'seconds': extract_seconds, 'peak_bytes': extract_peak},
+        'chunk': {
+            'seconds': chunk_seconds,
+            'peak_bytes': chunk_peak,
+            'encode_calls': counting.calls,
+            'encoded_texts': counting.texts,
+            'chunks': len(chunks),
+            'tokens': sum(count for _, count in chunks),
+        },
+    }
+
+
+def regressions(name: str, result: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list:
+    """Describe every way result is worse than baseline"""
+    found = []
+    for phase in ('extract', 'chunk'):
+        new, old = result[phase], baseline.get(phase)
+        if not old:
+            continue
+        if new['seconds'] > old['seconds'] * (1 + time_tolerance) and new['seconds'] - old['seconds'] > TIME_SLACK:
+            found.append(f"{name} {phase}: {new['seconds'] * 1000:.1f}ms vs {old['seconds'] * 1000:.1f}ms")
+        if new['peak_bytes'] > old['peak_bytes'] * (1 + memory_tolerance) and new['peak_bytes'] - old['peak_bytes'] > MEMORY_SLACK:
+            found.append(f"{name} {phase}: peak {new['peak_bytes'] / 2 ** 20:.2f}MB vs {old['peak_bytes'] / 2 ** 20:.2f}MB")
+    new, old = result['chunk'], baseline.get('chunk', {})
+    for counter in ('encode_calls', 'encoded_texts'):
+        if counter in old and new[counter] > old[counter]:
+            found.append(f"{name} chunk: {new[counter]} {counter.replace('_', ' ')} vs {old[counter]}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='*', default=[5, 50, 500, 5000], help='Synthetic page sizes in KB')
+    parser.add_argument('--file', action='append', default=[], help='Also benchmark a saved HTML file')
+    parser.add_argument('--no-corpus', action='store_true', help='Skip the pages in benchmarks/corpus')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare against or save to')
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='Allowed peak memory growth before failing')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    documents = [(f'synthetic-{size}kb', synthetic_page(size)) for size in args.sizes]
+    if not args.no_corpus:
+        documents += [(f'corpus/{name}', html) for name, html in load_corpus().items()]
+    for path in args.file:
+        with open(path, 'rb') as f:
+            documents.append((os.path.basename(path), f.read()))
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('documents', {})
+
+    chunker = ContentChunker()
+    results = {}
+    failures = []
+    print(f"{'document':<36}{'KB':>7}{'extract ms':>12}{'peak MB':>9}{'chunk ms':>10}{'peak MB':>9}{'encodes':>9}{'texts':>8}{'chunks':>8}")
+    for name, html in documents:
+        result = results[name] = bench_document(html, chunker, args.repeat)
+        extracted, chunked = result['extract'], result['chunk']
+        found = regressions(name, result, baseline[name], args.time_tolerance, args.memory_tolerance) if name in baseline else []
+        failures.extend(found)
+        print(
+            f"{name:<36}{len(html) / 1024:>7.0f}{extracted['seconds'] * 1000:>12.1f}{extracted['peak_bytes'] / 2 ** 20:>9.2f}"
+            f"{chunked['seconds'] * 1000:>10.1f}{chunked['peak_bytes'] / 2 ** 20:>9.2f}{chunked['encode_calls']:>9}"
+            f"{chunked['encoded_texts']:>8}{chunked['chunks']:>8}{'  REGRESSED' if found else ''}"
+        )
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'documents': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(1)
+
+    if failures:
+        print("\nRegressions against the baseline:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark HTML text extraction: legacy BeautifulSoup + html2text double pass
+versus the single-pass lxml extractor in app/services/extractor.py.
+
+Usage:
+    python benchmarks/bench_extraction.py
+    python benchmarks/bench_extraction.py --sizes 50 500 5000 --repeat 5
+    python benchmarks/bench_extraction.py --file saved_page.html
+
+Requires the legacy dependencies from benchmarks/requirements.txt.
+"""
+import argparse
+import difflib
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import html2text
+
+from app.services.extractor import extract_text
+from pages import synthetic_page
+
+
+def legacy_extract(html: bytes) -> str:
+    """The extraction path WebScraper.fetch_content used before the lxml extractor"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(['script', 'style', 'nav', 'footer', 'header']):
+        script.decompose()
+
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    h.ignore_emphasis = False
+    text = h.handle(str(soup))
+
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    return '\n'.join(lines)
+
+
+def measure(func, html: bytes, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(html)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return output, statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 2000], help='Synthetic page sizes in KB')
+    parser.add_argument('--file', action='append', default=[], help='Benchmark a saved HTML file instead')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    documents = []
+    for path in args.file:
+        with open(path, 'rb') as f:
+            documents.append((os.path.basename(path), f.read()))
+    if not args.file:
+        documents = [(f'synthetic {size} KB', synthetic_page(size)) for size in args.sizes]
+
+    print(f"{'document':<24}{'legacy ms':>12}{'lxml ms':>12}{'speedup':>10}{'legacy peak':>14}{'lxml peak':>12}{'similarity':>12}")
+    for name, html in documents:
+        legacy_text, legacy_time, legacy_peak = measure(legacy_extract, html, args.repeat)
+        new_text, new_time, new_peak = measure(extract_text, html, args.repeat)
+
+        # html2text hard-wraps at 78 columns; compare words, not line breaks
+        similarity = difflib.SequenceMatcher(None, legacy_text.split()[:20000], new_text.split()[:20000], autojunk=False).ratio()
+        print(
+            f"{name:<24}{legacy_time * 1000:>12.1f}{new_time * 1000:>12.1f}{legacy_time / new_time:>9.1f}x"
+            f"{legacy_peak / 2 ** 20:>12.1f}MB{new_peak / 2 ** 20:>10.1f}MB{similarity:>12.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Stand-in for the OpenAI chat completions API, for load tests that must not
+spend tokens or reach the network.
+
+Answers POST /v1/chat/completions with a schema-valid analysis (or, for
+aggregation prompts, an analysis with a summary) after a configurable
+delay, and fails a configurable share of calls with 429 or 500 so the
+client's retry path is exercised. Responses are derived from a hash of the
+prompt, so the same content always gets the same assessment.
+
+Usage:
+    python benchmarks/fake_openai.py --port 8100 --latency 0.8 --jitter 0.3
+    python benchmarks/fake_openai.py --port 8100 --error-rate 0.05
+
+Point the app at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+ASSESSMENTS = ("No", "No", "No", "Uncertain", "Yes")
+CONCERNS = [
+    "Claims are not attributed to named sources",
+    "Emotionally loaded language in key passages",
+    "Commercial interest in the conclusion",
+    "Statistics quoted without context",
+]
+INDICATORS = [
+    "Named sources and officials are quoted",
+    "Figures can be checked against public documents",
+    "Opposing views are represented",
+    "Clear separation of reporting and opinion",
+]
+
+
+def fake_analysis(prompt: str, aggregation: bool) -> dict:
+    """A plausible analysis, fixed for a given prompt"""
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+    result = {
+        "out_of_context": {"assessment": rng.choice(ASSESSMENTS), "explanation": "Stand-in assessment from the fake LLM server."},
+        "propaganda": {"assessment": rng.choice(ASSESSMENTS), "explanation": "Stand-in assessment from the fake LLM server."},
+        "credibility_score": rng.randint(20, 95),
+        "content_context": "Stand-in description of the content produced for load testing.",
+        "key_concerns": rng.sample(CONCERNS, rng.randint(0, 2)),
+        "positive_indicators": rng.sample(INDICATORS, rng.randint(1, 3)),
+    }
+    if aggregation:
+        result["summary"] = "Stand-in overall assessment combining the chunk analyses."
+    return result
+
+
+def create_app(latency: float = 0.8, jitter: float = 0.3, error_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    """
+    Build the fake API
+
+    Args:
+        latency: Mean seconds before a response
+        jitter: Standard deviation of the delay, in seconds
+        error_rate: Share of calls (0-1) answered with a 429 or 500
+        seed: Seed for delays and injected errors
+    """
+    app = FastAPI(title="Fake OpenAI")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    @app.get("/health")
+    async def health():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, rng.gauss(latency, jitter)))
+
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            status = rng.choice((429, 500))
+            kind = "rate_limit_exceeded" if status == 429 else "server_error"
+            return JSONResponse(
+                {"error": {"message": "Injected failure from the fake LLM server", "type": kind, "code": kind}},
+                status_code=status,
+            )
+
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        aggregation = "You have analyzed multiple chunks" in prompt
+        content = json.dumps(fake_analysis(prompt, aggregation))
+        # Roughly four characters per token, like English text under cl100k
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-fake{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', type=float, default=0.8, help='Mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Standard deviation of the delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls (0-1) failed with 429 or 500')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""
+End-to-end load test of POST /api/analyze that runs entirely offline.
+
+Starts local stand-ins for everything the app talks to:
+  - a static server for the saved pages in benchmarks/corpus, plus
+    synthetic pages of the requested sizes,
+  - the fake OpenAI server from benchmarks/fake_openai.py,
+  - the app itself under uvicorn, with OPENAI_BASE_URL pointed at the fake
+    server and a throwaway SQLite database (or --database-url),
+then drives /api/analyze at a fixed concurrency and reports latency
+percentiles, throughput, event loop lag and mean stage times (the last two
+from the app's /metrics).
+
+By default every request uses a fresh URL with the result, near-duplicate
+and LLM caches disabled, so each one runs the whole pipeline. --cached
+leaves the caches on and repeats URLs to measure the warm path.
+
+Usage:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --concurrency 50 --requests 1000 --llm-latency 1.5
+    python benchmarks/loadtest.py --llm-error-rate 0.05 --max-error-rate 0.01 --json loadtest.json
+    python benchmarks/loadtest.py --env AGGREGATION_MODE=flat --synthetic-sizes 500
+
+tiktoken loads its encoding from the network the first time; on an offline
+machine point TIKTOKEN_CACHE_DIR at a directory where it is already cached.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from pages import load_corpus, synthetic_page
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_OPENAI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_openai.py')
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_pages(pages: dict) -> ThreadingHTTPServer:
+    """Serve pages (path -> bytes) on a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = pages.get(self.path.split('?', 1)[0])
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_process(command, log_path: str, env=None) -> subprocess.Popen:
+    log = open(log_path, 'wb')
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, process: subprocess.Popen, log_path: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, errors='replace') as f:
+                sys.exit(f"{url} exited during startup:\n{f.read()[-4000:]}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} did not become ready within {timeout:.0f}s (log: {log_path})")
+
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_metrics(text: str) -> dict:
+    """Prometheus text format as {(name, ((label, value), ...)): value}"""
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, tuple(sorted(LABEL.findall(labels or ''))))] = float(value)
+    return samples
+
+
+def histogram_quantile(buckets, q: float) -> float:
+    """Estimate a quantile from cumulative (upper bound, count) buckets, as Prometheus does"""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return 0.0
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float('inf'):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+def metrics_delta(before: dict, after: dict) -> dict:
+    return {key: value - before.get(key, 0.0) for key, value in after.items()}
+
+
+def summarize_metrics(delta: dict) -> dict:
+    lag_buckets = [
+        (float(dict(labels)['le']), value)
+        for (name, labels), value in delta.items() if name == 'readsmart_event_loop_lag_seconds_bucket'
+    ]
+    lag_count = delta.get(('readsmart_event_loop_lag_seconds_count', ()), 0)
+    lag_sum = delta.get(('readsmart_event_loop_lag_seconds_sum', ()), 0)
+
+    stages = {}
+    for (name, labels), value in delta.items():
+        if name == 'readsmart_stage_duration_seconds_count' and value:
+            stage = dict(labels)['stage']
+            total = delta.get(('readsmart_stage_duration_seconds_sum', labels), 0)
+            stages[stage] = {'count': int(value), 'mean_seconds': total / value}
+
+    tokens = sum(value for (name, _), value in delta.items() if name == 'readsmart_llm_tokens_total')
+    return {
+        'event_loop_lag': {
+            'samples': int(lag_count),
+            'mean_seconds': lag_sum / lag_count if lag_count else 0.0,
+            'p50_seconds': histogram_quantile(lag_buckets, 0.5),
+            'p99_seconds': histogram_quantile(lag_buckets, 0.99),
+        },
+        'stages': stages,
+        'llm_tokens': int(tokens),
+    }
+
+
+async def drive(app_url: str, urls, concurrency: int, total: int, duration: float, timeout: float):
+    """Send POST /api/analyze from concurrency workers; return (latencies, failures, elapsed)"""
+    latencies = []
+    failures = {}
+    sent = 0
+    deadline = time.monotonic() + duration if duration else None
+
+    async def worker(client):
+        nonlocal sent
+        while (not total or sent < total) and (deadline is None or time.monotonic() < deadline):
+            url = urls(sent)
+            sent += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post('/api/analyze', json={'url': url})
+                outcome = str(response.status_code)
+                if response.status_code == 200:
+                    outcome = response.json().get('status', 'unknown')
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if outcome == 'completed':
+                latencies.append(elapsed)
+            else:
+                failures[outcome] = failures.get(outcome, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return sorted(latencies), failures, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight at once')
+    parser.add_argument('--requests', type=int, default=200, help='Requests to send (0: until --duration)')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds (0: no limit)')
+    parser.add_argument('--warmup', type=int, default=None, help='Unmeasured requests first (default: --concurrency)')
+    parser.add_argument('--synthetic-sizes', type=int, nargs='*', default=[50, 200], help='Synthetic page sizes in KB, served alongside the corpus')
+    parser.add_argument('--llm-latency', type=float, default=0.8, help='Mean fake LLM response time in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.3, help='Standard deviation of the fake LLM response time')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Share of LLM calls failed with 429 or 500')
+    parser.add_argument('--cached', action='store_true', help='Keep the app caches on and repeat URLs')
+    parser.add_argument('--database-url', help='Database for the app (default: a temporary SQLite file)')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help='Extra environment for the app')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='Exit with status 1 above this share of failed requests')
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        parser.error('set --requests or --duration')
+
+    pages = {f'/{name}': body for name, body in load_corpus().items()}
+    for size in args.synthetic_sizes:
+        pages[f'/synthetic/{size}.html'] = synthetic_page(size, args.seed)
+    paths = sorted(pages)
+
+    workdir = tempfile.mkdtemp(prefix='readsmart-loadtest-')
+    page_server = serve_pages(pages)
+    page_url = f'http://127.0.0.1:{page_server.server_address[1]}'
+    llm_port, app_port = free_port(), free_port()
+    app_url = f'http://127.0.0.1:{app_port}'
+
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        'OPENAI_API_KEY': 'fake-key',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{llm_port}/v1',
+        # Every page comes from one host; don't let the per-host limit become the bottleneck
+        'SCRAPER_MAX_CONNECTIONS_PER_HOST': str(max(6, args.concurrency)),
+        'EVENT_LOOP_LAG_INTERVAL': '0.05',
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+    })
+    if args.cached:
+        env['LLM_CACHE_PATH'] = os.path.join(workdir, 'llm_cache.sqlite3')
+    else:
+        env.update({'LLM_CACHE_PATH': '', 'RESULT_CACHE_TTL': '0', 'NEAR_DUP_THRESHOLD': '0'})
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+
+    llm_log, app_log = os.path.join(workdir, 'fake_openai.log'), os.path.join(workdir, 'app.log')
+    llm = start_process([
+        sys.executable, FAKE_OPENAI, '--port', str(llm_port), '--latency', str(args.llm_latency),
+        '--jitter', str(args.llm_jitter), '--error-rate', str(args.llm_error_rate), '--seed', str(args.seed),
+    ], llm_log)
+    app = start_process([
+        sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(app_port),
+        '--log-level', 'warning', '--no-access-log',
+    ], app_log, env)
+
+    run_id = int(time.time())
+
+    def urls(offset):
+        def url(i):
+            path = paths[i % len(paths)]
+            if args.cached:
+                return page_url + path
+            return f'{page_url}{path}?run={run_id}-{offset + i}'
+        return url
+
+    try:
+        wait_ready(f'http://127.0.0.1:{llm_port}/health', llm, llm_log)
+        wait_ready(f'{app_url}/', app, app_log)
+
+        warmup = args.concurrency if args.warmup is None else args.warmup
+        if warmup:
+            asyncio.run(drive(app_url, urls(0), args.concurrency, warmup, 0, args.timeout))
+
+        before = parse_metrics(httpx.get(f'{app_url}/metrics').text)
+        llm_before = httpx.get(f'http://127.0.0.1:{llm_port}/health').json()
+        latencies, failures, elapsed = asyncio.run(
+            drive(app_url, urls(warmup), args.concurrency, args.requests, args.duration, args.timeout)
+        )
+        after = parse_metrics(httpx.get(f'{app_url}/metrics').text)
+        llm_stats = httpx.get(f'http://127.0.0.1:{llm_port}/health').json()
+    finally:
+        stop_process(app)
+        stop_process(llm)
+        page_server.shutdown()
+
+    completed = len(latencies)
+    failed = sum(failures.values())
+    report = {
+        'concurrency': args.concurrency,
+        'pages': len(paths),
+        'cached': args.cached,
+        'requests': completed + failed,
+        'completed': completed,
+        'failed': failed,
+        'failures': failures,
+        'elapsed_seconds': elapsed,
+        'throughput_per_second': completed / elapsed if elapsed else 0.0,
+        'latency_seconds': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'llm_calls': llm_stats['requests'] - llm_before['requests'],
+        'llm_injected_errors': llm_stats['errors'] - llm_before['errors'],
+        **summarize_metrics(metrics_delta(before, after)),
+    }
+
+    latency = report['latency_seconds']
+    lag = report['event_loop_lag']
+    print(f"requests     {report['requests']} ({completed} completed, {failed} failed) at concurrency {args.concurrency}")
+    if failures:
+        print(f"failures     {', '.join(f'{outcome}: {count}' for outcome, count in sorted(failures.items()))}")
+    print(f"throughput   {report['throughput_per_second']:.2f} analyses/s over {elapsed:.1f}s")
+    print(f"latency      p50 {latency['p50'] * 1000:.0f}ms  p95 {latency['p95'] * 1000:.0f}ms  "
+          f"p99 {latency['p99'] * 1000:.0f}ms  max {latency['max'] * 1000:.0f}ms")
+    print(f"loop lag     mean {lag['mean_seconds'] * 1000:.1f}ms  p50 {lag['p50_seconds'] * 1000:.1f}ms  "
+          f"p99 {lag['p99_seconds'] * 1000:.1f}ms  ({lag['samples']} samples)")
+    print(f"llm          {report['llm_calls']} calls, {report['llm_injected_errors']} injected errors, {report['llm_tokens']} tokens")
+    print(f"{'stage':<16}{'count':>8}{'mean ms':>10}")
+    for name, stage in sorted(report['stages'].items()):
+        print(f"{name:<16}{stage['count']:>8}{stage['mean_seconds'] * 1000:>10.1f}")
+    print(f"logs in {workdir}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    total = completed + failed
+    if total and failed / total > args.max_error_rate:
+        sys.exit(f"{failed / total:.1%} of requests failed (allowed: {args.max_error_rate:.1%})")
+
+
+if __name__ == '__main__':
+    main()
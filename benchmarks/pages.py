@@ -0,0 +1,59 @@
+"""
+Pages shared by the benchmark scripts: synthetic news-like pages of any
+size, and the saved pages under benchmarks/corpus.
+"""
+import os
+import random
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+WORDS = (
+    "the government said officials report analysis claims source according "
+    "minister economy percent election study data evidence people city"
+).split()
+
+
+def synthetic_page(size_kb: int, seed: int = 0) -> bytes:
+    """Build a news-like page of roughly size_kb kilobytes"""
+    rng = random.Random(seed)
+
+    def sentence():
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        if rng.random() < 0.3:
+            words[2] = f'<a href="https://example.com/{rng.randint(1, 999)}">{words[2]}</a>'
+        if rng.random() < 0.2:
+            words[4] = f'<strong>{words[4]}</strong>'
+        return ' '.join(words).capitalize() + '.'
+
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Benchmark page</title>',
+        '<style>body { font-family: sans-serif; }</style></head><body>',
+        '<header><a href="/">Home</a> <a href="/news">News</a></header>',
+        '<nav><ul>' + ''.join(f'<li><a href="/s{i}">Section {i}</a></li>' for i in range(20)) + '</ul></nav>',
+        '<article><h1>Benchmark headline</h1>',
+    ]
+    size = sum(len(p) for p in parts)
+    while size < size_kb * 1024:
+        roll = rng.random()
+        if roll < 0.75:
+            block = '<p>' + ' '.join(sentence() for _ in range(rng.randint(2, 6))) + '</p>'
+        elif roll < 0.85:
+            block = '<ul>' + ''.join(f'<li>{sentence()}</li>' for _ in range(4)) + '</ul>'
+        elif roll < 0.92:
+            block = '<script>window.dataLayer.push({"event": "view", "id": %d});</script>' % rng.randint(1, 10 ** 6)
+        else:
+            block = '<h2>' + sentence() + '</h2>'
+        parts.append(block)
+        size += len(block)
+    parts.append('</article><footer>Copyright</footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def load_corpus(directory: str = CORPUS_DIR) -> dict:
+    """Saved pages by file name"""
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages[name] = f.read()
+    return pages
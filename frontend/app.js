@@ -10,9 +10,18 @@ const errorMessage = document.getElementById('errorMessage');
 const retryBtn = document.getElementById('retryBtn');
 const resultsSection = document.getElementById('resultsSection');
 const newAnalysisBtn = document.getElementById('newAnalysisBtn');
+const progressStage = document.getElementById('progressStage');
+const progressDetail = document.getElementById('progressDetail');
+const progressBar = document.getElementById('progressBar');
+const progressFill = document.getElementById('progressFill');
+const provisionalResults = document.getElementById('provisionalResults');
+
+// Polling interval when Server-Sent Events are unavailable
+const POLL_INTERVAL_MS = 2000;
 
 // Current state
 let currentUrl = '';
+let activeEventSource = null;
 
 // Event Listeners
 analyzeBtn.addEventListener('click', handleAnalyze);
@@ -43,7 +52,7 @@ async function handleAnalyze() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ url: url })
+            body: JSON.stringify({ url: url, async_mode: true })
         });
 
         if (!response.ok) {
@@ -56,21 +65,166 @@ async function handleAnalyze() {
         }
 
         const data = await response.json();
-        displayResults(data);
+        if (data.status === 'pending') {
+            followProgress(data.request_id);
+        } else {
+            // Served from the result cache
+            displayResults(data);
+        }
+    } catch (error) {
+        showError(error.message);
+    }
+}
+
+// Follow analysis progress over Server-Sent Events
+function followProgress(requestId) {
+    if (!window.EventSource) {
+        pollResult(requestId);
+        return;
+    }
+
+    const source = new EventSource(`${API_BASE_URL}/analysis/${requestId}/events`);
+    activeEventSource = source;
+    const chunkResults = [];
+    let totalChunks = 0;
+
+    source.addEventListener('fetched', (e) => {
+        const data = JSON.parse(e.data);
+        showProgress('Page fetched, splitting into sections...', data.title ? `"${data.title}"` : '');
+    });
+
+    source.addEventListener('chunked', (e) => {
+        totalChunks = JSON.parse(e.data).total_chunks;
+        showProgress(`Analyzing ${totalChunks} section${totalChunks === 1 ? '' : 's'}...`, '', 0);
+    });
+
+    source.addEventListener('chunk', (e) => {
+        const data = JSON.parse(e.data);
+        chunkResults.push(data.result);
+        showProgress(
+            `Analyzed ${chunkResults.length} of ${totalChunks} sections...`,
+            'Early findings below may change once all sections are done',
+            chunkResults.length / totalChunks
+        );
+        displayProvisional(chunkResults);
+    });
+
+    source.addEventListener('aggregating', () => {
+        showProgress('Combining section results...', '', 1);
+    });
+
+    source.addEventListener('completed', () => {
+        closeEventSource();
+        loadResult(requestId);
+    });
+
+    source.addEventListener('failed', (e) => {
+        closeEventSource();
+        showError(JSON.parse(e.data).error || 'Analysis failed. Please try again.');
+    });
+
+    source.onerror = () => {
+        // Connection dropped (proxy timeout, server restart); fall back to polling
+        if (activeEventSource === source) {
+            closeEventSource();
+            pollResult(requestId);
+        }
+    };
+}
+
+function closeEventSource() {
+    if (activeEventSource) {
+        activeEventSource.close();
+        activeEventSource = null;
+    }
+}
+
+// Poll until the analysis is no longer pending
+async function pollResult(requestId) {
+    try {
+        const data = await fetchResult(requestId);
+        if (data.status === 'pending') {
+            setTimeout(() => pollResult(requestId), POLL_INTERVAL_MS);
+        } else if (data.status === 'failed') {
+            showError(data.error_message || 'Analysis failed. Please try again.');
+        } else {
+            displayResults(data);
+        }
     } catch (error) {
         showError(error.message);
     }
 }
 
+async function loadResult(requestId) {
+    try {
+        displayResults(await fetchResult(requestId));
+    } catch (error) {
+        showError(error.message);
+    }
+}
+
+async function fetchResult(requestId) {
+    const response = await fetch(`${API_BASE_URL}/analysis/${requestId}`);
+    if (!response.ok) {
+        throw new Error('Could not load analysis result. Please try again.');
+    }
+    return response.json();
+}
+
+// Update the loading state with the current stage
+function showProgress(stage, detail, fraction) {
+    progressStage.textContent = stage;
+    progressDetail.textContent = detail;
+    if (fraction !== undefined) {
+        progressBar.classList.remove('hidden');
+        progressFill.style.width = `${Math.round(fraction * 100)}%`;
+    }
+}
+
+// Show provisional findings from the chunks analyzed so far
+function displayProvisional(chunkResults) {
+    provisionalResults.classList.remove('hidden');
+
+    const scores = chunkResults.map(result => Number(result.credibility_score) || 0);
+    const average = scores.reduce((sum, score) => sum + score, 0) / scores.length;
+    document.getElementById('provisionalScore').textContent = Math.round(average);
+
+    displayProvisionalAssessment('provisionalContext', chunkResults, 'out_of_context');
+    displayProvisionalAssessment('provisionalPropaganda', chunkResults, 'propaganda');
+
+    const concerns = [...new Set(chunkResults.flatMap(result => result.key_concerns || []))];
+    displayList('provisionalConcerns', concerns.slice(0, 3), 'No major concerns so far.');
+}
+
+function displayProvisionalAssessment(elementId, chunkResults, key) {
+    const counts = {};
+    chunkResults.forEach(result => {
+        const assessment = result[key]?.assessment || 'Uncertain';
+        counts[assessment] = (counts[assessment] || 0) + 1;
+    });
+    const status = Object.keys(counts).reduce((a, b) => (counts[b] > counts[a] ? b : a));
+
+    const element = document.getElementById(elementId);
+    element.textContent = status;
+    element.className = 'status-badge ' + status.toLowerCase();
+}
+
 // Show Loading State
 function showLoading() {
+    closeEventSource();
     hideAllStates();
+    progressStage.textContent = 'Analyzing website content...';
+    progressDetail.textContent = 'This may take 30-60 seconds depending on content length';
+    progressBar.classList.add('hidden');
+    progressFill.style.width = '0';
+    provisionalResults.classList.add('hidden');
     loadingState.classList.remove('hidden');
     analyzeBtn.disabled = true;
 }
 
 // Show Error State
 function showError(message) {
+    closeEventSource();
     hideAllStates();
     errorMessage.textContent = message;
     errorState.classList.remove('hidden');
@@ -228,6 +382,7 @@ function handleRetry() {
 
 // Handle New Analysis
 function handleNewAnalysis() {
+    closeEventSource();
     urlInput.value = '';
     currentUrl = '';
     hideAllStates();
@@ -0,0 +1,30 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level services read their settings on import
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["LLM_CACHE_PATH"] = ""
+
+from app.database import close_db, init_db  # noqa: E402
+
+
+@pytest.fixture
+def run_db(tmp_path, monkeypatch):
+    """Run a coroutine function against a fresh SQLite database"""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+
+    def run(coroutine_function):
+        async def main():
+            await init_db()
+            try:
+                return await coroutine_function()
+            finally:
+                await close_db()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.services.analyzer import ContentAnalyzer
+
+
+def test_analyze_chunks_cancels_the_rest_when_one_fails(monkeypatch):
+    analyzer = ContentAnalyzer(max_concurrency=3)
+    started, cancelled, results = [], [], []
+
+    async def analyze_chunk_async(chunk, chunk_index, total_chunks):
+        started.append(chunk_index)
+        if chunk_index == 0:
+            await asyncio.sleep(0.01)
+            raise Exception("AI analysis failed: boom")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(chunk_index)
+            raise
+        return {}
+    monkeypatch.setattr(analyzer, "analyze_chunk_async", analyze_chunk_async)
+
+    async def scenario():
+        with pytest.raises(Exception, match="boom"):
+            await analyzer.analyze_chunks(["a", "b", "c", "d"], on_result=lambda i, r: results.append(i))
+        # Cancelled before the error reaches the caller, not when the loop shuts down
+        assert len(cancelled) >= 2
+        assert sorted(cancelled) == sorted(started[1:])
+        await analyzer.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), 2))
+    assert results == []
+
+
+def test_offline_analyzer_builds_request_bodies_without_an_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY")
+    with pytest.raises(ValueError):
+        ContentAnalyzer()
+
+    analyzer = ContentAnalyzer(offline=True)
+    body = analyzer.analysis_request_body("Some page text", 0, 2)
+    assert body["model"] == analyzer.model
+    assert "Some page text" in body["messages"][1]["content"]
+    asyncio.run(analyzer.close())
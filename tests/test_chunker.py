@@ -0,0 +1,62 @@
+import pytest
+import tiktoken
+
+from app.services import chunker as chunker_module
+from app.services.chunker import ContentChunker
+
+
+def toy_encoding():
+    """Byte-level encoding with a few merges, so tests need no download"""
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in [b"th", b"he", b" t", b"the", b" the", b"at", b" c", b" cat"]:
+        ranks[merge] = len(ranks)
+    pattern = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+    return tiktoken.Encoding("toy", pat_str=pattern, mergeable_ranks=ranks, special_tokens={})
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    monkeypatch.setattr(chunker_module.tiktoken, "encoding_for_model", lambda model: toy_encoding())
+
+
+def test_paragraph_overlap_boundaries():
+    # Same chunks as re-encoding each chunk to cut its overlap
+    text = "\n\n".join(f"the cat {i} sat on the mat" for i in range(6))
+    chunks = ContentChunker(max_tokens=30, overlap=5).chunk_content(text)
+    assert chunks == ["the cat 0 sat on the mat\n\nthe cat 1 sat on the mat"] + [
+        f"n the mat\n\nthe cat {i} sat on the mat" for i in range(2, 6)
+    ]
+
+
+def test_sentence_split_overlap_boundaries():
+    # One paragraph longer than max_tokens, so it is packed sentence by sentence.
+    # Overlaps are cut from the ids of the separately encoded sentences. For the
+    # third chunk that starts at "the" rather than at ". the", where the last six
+    # tokens of the re-encoded second chunk would begin.
+    text = ("hat the the mat sat. on mat sat cat a cat. on the cat mat on. "
+            "the the a. on the mat a a on. hat the cat hat the")
+    chunker = ContentChunker(max_tokens=24, overlap=6)
+    chunks = chunker.chunk_content_with_counts(text)
+    assert [chunk for chunk, _ in chunks] == [
+        "hat the the mat sat. on mat sat cat a cat.",
+        "at cat a cat.\n\non the cat mat on. the the a.",
+        "the the a.\n\non the mat a a on.",
+        "a on.\n\nhat the cat hat the.",
+    ]
+    assert all(count <= chunker.max_tokens for _, count in chunks)
+
+
+def test_presplit_paragraph_that_fits_keeps_its_separators():
+    # Each paragraph is longer than max_tokens in bytes, so it is encoded sentence
+    # by sentence, but short enough in tokens to be packed whole. Its ". "
+    # separators must be counted, or both paragraphs share one oversized chunk...
+    paragraph = "the cat the cat. the cat the cat"
+    chunker = ContentChunker(max_tokens=16, overlap=2)
+    chunks = chunker.chunk_content_with_counts("\n\n".join([paragraph] * 2))
+    assert [chunk for chunk, _ in chunks] == [paragraph, "the cat\n\n" + paragraph]
+    assert all(count <= chunker.max_tokens for _, count in chunks)
+
+    # ...and kept in the ids overlaps are cut from, or the overlap runs the
+    # sentences together ("the catthe cat")
+    chunks = ContentChunker(max_tokens=20, overlap=10).chunk_content("\n\n".join([paragraph] * 3))
+    assert chunks == [f"{paragraph}\n\n{paragraph}"] * 2
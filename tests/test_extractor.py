@@ -0,0 +1,27 @@
+import pytest
+
+from app.services.extractor import HTMLTextExtractor
+
+
+def extract_in_pieces(html: bytes, size: int, encoding=None) -> str:
+    extractor = HTMLTextExtractor(encoding)
+    for start in range(0, len(html), size):
+        extractor.feed(html[start:start + size])
+    return extractor.close()
+
+
+def test_meta_charset_after_a_small_first_feed():
+    html = b'<html><head><meta charset="iso-8859-1"></head><body><p>' + "Café crème".encode("latin-1") + b"</p></body></html>"
+    assert extract_in_pieces(html, 7) == "Café crème"
+
+
+@pytest.mark.parametrize("codec", ["utf-8", "cp1252"])
+def test_undeclared_encoding_is_detected(codec):
+    html = "<html><body><p>Café crème “quoted”</p></body></html>".encode(codec)
+    assert extract_in_pieces(html, 7) == "Café crème “quoted”"
+
+
+def test_non_ascii_text_after_the_sniffed_block():
+    body = b"<p>plain ascii text</p>" * 500 + "<p>Café crème</p>".encode("cp1252")
+    text = extract_in_pieces(b"<html><body>" + body + b"</body></html>", 64 * 1024)
+    assert text.endswith("\nCafé crème")
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import asyncio
+
+from sqlalchemy import select
+
+from app.database import get_async_session_local
+from app.models import AnalysisBatch, AnalysisRequest
+from app.services.jobs import AnalysisJobQueue, INTERRUPTED_MESSAGE
+
+
+async def add_rows(*rows):
+    async with get_async_session_local()() as db:
+        db.add_all(rows)
+        await db.commit()
+        return [row.id for row in rows]
+
+
+async def statuses():
+    async with get_async_session_local()() as db:
+        rows = (await db.execute(select(AnalysisRequest.id, AnalysisRequest.status, AnalysisRequest.error_message))).all()
+        return {row.id: (row.status, row.error_message) for row in rows}
+
+
+def hanging_services():
+    async def fetch(url):
+        await asyncio.Event().wait()
+    return SimpleNamespace(scraper=SimpleNamespace(fetch=fetch))
+
+
+def test_stop_fails_queued_and_running_jobs(run_db):
+    async def scenario():
+        ids = await add_rows(
+            AnalysisRequest(url="https://a.example/1", status="pending"),
+            AnalysisRequest(url="https://a.example/2", status="pending"),
+        )
+        queue = AnalysisJobQueue(num_workers=1, max_size=10)
+        queue.start(hanging_services())
+        for request_id in ids:
+            queue.submit(request_id, f"https://a.example/{request_id}")
+        # The first job is running, the second still queued
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return ids, await statuses()
+
+    ids, result = run_db(scenario)
+    assert [result[request_id] for request_id in ids] == [("failed", INTERRUPTED_MESSAGE)] * 2
+
+
+def test_fail_abandoned_only_touches_old_pending_rows(run_db):
+    async def scenario():
+        old = datetime.now(timezone.utc) - timedelta(hours=2)
+        [batch_id] = await add_rows(AnalysisBatch(total=1))
+        ids = await add_rows(
+            AnalysisRequest(url="https://b.example/old", status="pending", requested_at=old),
+            AnalysisRequest(url="https://b.example/recent", status="pending"),
+            AnalysisRequest(url="https://b.example/done", status="completed", requested_at=old),
+            AnalysisRequest(url="https://b.example/batched", status="pending", requested_at=old, batch_id=batch_id),
+        )
+        await AnalysisJobQueue(timeout=3600).fail_abandoned()
+        return ids, await statuses()
+
+    (old, recent, done, batched), result = run_db(scenario)
+    assert result[old] == ("failed", INTERRUPTED_MESSAGE)
+    assert result[recent] == ("pending", None)
+    assert result[done] == ("completed", None)
+    # Possibly still queued in another process's batch pipeline
+    assert result[batched] == ("pending", None)
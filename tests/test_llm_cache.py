@@ -0,0 +1,31 @@
+from app.services.llm_cache import LLMResponseCache
+
+
+def test_size_limit_holds_across_processes_sharing_the_file(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    value = {"summary": "x" * 1000}
+    first = LLMResponseCache(path, max_bytes=20_000)
+    second = LLMResponseCache(path, max_bytes=20_000)
+
+    for i in range(30):
+        first.set(f"first-{i}", value)
+        second.set(f"second-{i}", value)
+
+    stored = first._conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert stored <= 20_000
+    first.close()
+    second.close()
+
+
+def test_hits_keep_recently_used_entries_through_eviction(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"), max_bytes=10_000)
+    value = {"summary": "x" * 1000}
+    cache.set("kept", value)
+    for i in range(8):
+        cache.set(f"filler-{i}", value)
+        assert cache.get("kept") == value
+
+    cache.set("overflow", value)
+    assert cache.get("kept") == value
+    assert cache.get("filler-0") is None
+    cache.close()
@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app import database
+from app.migrate import migrate
+from app.models import url_hash
+
+# analysis_requests as the original models created it
+OLD_SCHEMA = [
+    """CREATE TABLE analysis_requests (
+        id INTEGER NOT NULL,
+        url VARCHAR(2048) NOT NULL,
+        user_ip VARCHAR(45),
+        requested_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        is_out_of_context VARCHAR(50),
+        is_propaganda VARCHAR(50),
+        credibility_score FLOAT,
+        content_context TEXT,
+        analysis_duration FLOAT,
+        status VARCHAR(20),
+        error_message TEXT,
+        detailed_results JSON,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_analysis_requests_id ON analysis_requests (id)",
+    "INSERT INTO analysis_requests (url, status, detailed_results) "
+    "VALUES ('https://A.example/x?utm_source=feed#top', 'completed', '{\"credibility_score\": 80}')",
+]
+
+
+def test_migrate_adds_missing_columns_and_indexes(tmp_path, monkeypatch, capsys):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setattr(database, "_engine", None)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+
+    statements = migrate()
+    assert any("ADD COLUMN batch_id INTEGER REFERENCES analysis_batches (id)" in s for s in statements)
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("analysis_requests")}
+    assert {"url_hash", "host", "source_request_id", "batch_id", "timings", "page_title", "final_url"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("analysis_requests")}
+    assert {
+        "ix_analysis_requests_requested_at",
+        "ix_analysis_requests_url_hash_requested_at",
+        "ix_analysis_requests_host_requested_at",
+        "ix_analysis_requests_status_requested_at",
+    } <= indexes
+    assert "content_fingerprints" in inspector.get_table_names()
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT normalized_url, url_hash, host FROM analysis_requests")).one()
+    assert row == ("https://a.example/x", url_hash("https://a.example/x"), "a.example")
+
+    with engine.connect() as connection:
+        details = connection.execute(text("SELECT request_id, results FROM analysis_details")).all()
+    assert details == [(1, '{"credibility_score": 80}')]
+
+    assert migrate() == []
+    assert "Schema is up to date" in capsys.readouterr().out
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM analysis_details")).scalar() == 1
+    database._engine.dispose()
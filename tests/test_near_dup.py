@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from app.database import get_async_session_local
+from app.models import AnalysisRequest
+from app.services import pipeline
+from app.services.near_dup import near_duplicates
+from app.services.scraper import ScrapeResult
+
+TEXT = " ".join(f"word{i % 997} filler{i % 13}" for i in range(5000))
+
+
+def slow_signature(monkeypatch, seconds=0.3):
+    """Make fingerprinting take a while, as it does on a multi-megabyte page"""
+    signature = near_duplicates.signature
+
+    def slow(text):
+        time.sleep(seconds)
+        return signature(text)
+    monkeypatch.setattr(near_duplicates, "signature", slow)
+    monkeypatch.setattr(near_duplicates, "threshold", 0.9)
+
+
+async def max_loop_gap(coroutine):
+    """Longest time the event loop went without running a 10 ms ticker while coroutine ran"""
+    gaps = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    try:
+        result = await coroutine
+    finally:
+        task.cancel()
+    return result, max(gaps)
+
+
+def test_find_near_duplicate_fingerprints_off_the_event_loop(run_db, monkeypatch):
+    slow_signature(monkeypatch)
+
+    async def scenario():
+        scrape = ScrapeResult(text=TEXT, bytes_downloaded=len(TEXT))
+        result, gap = await max_loop_gap(pipeline.find_near_duplicate(scrape))
+        assert result is None
+        assert scrape.signature is not None
+        assert gap < 0.2
+
+    run_db(scenario)
+
+
+def test_index_fingerprint_fingerprints_off_the_event_loop(run_db, monkeypatch):
+    slow_signature(monkeypatch)
+
+    async def scenario():
+        async with get_async_session_local()() as db:
+            row = AnalysisRequest(url="https://a.example/1", status="completed")
+            db.add(row)
+            await db.flush()
+            scrape = ScrapeResult(text=TEXT, bytes_downloaded=len(TEXT))
+            _, gap = await max_loop_gap(pipeline.index_fingerprint(db, row.id, scrape))
+            await db.commit()
+        assert gap < 0.2
+
+    run_db(scenario)
@@ -0,0 +1,13 @@
+from app.services import profiling
+from app.services.profiling import AnalysisProfiler
+
+
+def test_authorized_rejects_non_ascii_tokens(monkeypatch):
+    monkeypatch.setattr(profiling, "PYINSTRUMENT_AVAILABLE", True)
+    profiler = AnalysisProfiler(token="s3cret", directory="unused")
+
+    assert profiler.authorized("s3cret")
+    assert not profiler.authorized("s3crét")
+    assert not profiler.authorized("\xff\xfe")
+    assert not profiler.authorized(None)
+    assert not AnalysisProfiler(token="", directory="unused").authorized("")
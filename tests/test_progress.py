@@ -0,0 +1,32 @@
+from app.services.progress import ProgressBroker
+
+
+def test_finished_and_abandoned_channels_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.progress.time.time", lambda: now[0])
+    broker = ProgressBroker(retention=60, max_age=600)
+
+    broker.publish(1, "fetched")
+    broker.publish(1, "completed")
+    broker.publish(2, "fetched")  # never finishes
+
+    now[0] += 61
+    broker.publish(3, "fetched")
+    assert set(broker._channels) == {2, 3}
+
+    now[0] += 600
+    broker.publish(4, "fetched")
+    assert set(broker._channels) == {3, 4}
+
+
+def test_publish_does_not_scan_channels_every_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.progress.time.time", lambda: now[0])
+    broker = ProgressBroker(retention=60, max_age=600)
+    scans = []
+    original = broker._prune
+    monkeypatch.setattr(broker, "_prune", lambda at: (scans.append(at), original(at)))
+
+    for request_id in range(100):
+        broker.publish(request_id, "chunk")
+    assert len(scans) == 1
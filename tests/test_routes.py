@@ -0,0 +1,63 @@
+from fastapi import FastAPI
+import httpx
+
+from app.api import routes
+from app.api.routes import router
+from app.database import get_async_session_local
+from app.models import AnalysisRequest
+from app.services.analysis_cache import analysis_cache
+from app.services.container import get_services
+from app.services.scraper import ScrapeResult
+from app.services.url_cache import LRUCache, result_cache
+
+
+def test_field_selection_etag_does_not_depend_on_the_cache(run_db, monkeypatch):
+    monkeypatch.setattr(analysis_cache, "memory", LRUCache(16))
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+
+    async def scenario():
+        async with get_async_session_local()() as db:
+            row = AnalysisRequest(url="https://a.example/x", status="completed", page_title="Café crème",
+                                  credibility_score=72.5, detailed_results={"summary": "Ünïcode"})
+            db.add(row)
+            await db.commit()
+
+        url = f"/api/analysis/{row.id}?fields=page_title,credibility_score"
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            cold = await client.get(url)
+            await client.get(f"/api/analysis/{row.id}")  # Caches the full response
+            warm = await client.get(url)
+            revalidated = await client.get(url, headers={"If-None-Match": cold.headers["etag"]})
+        return cold, warm, revalidated
+
+    cold, warm, revalidated = run_db(scenario)
+    assert cold.status_code == 200
+    assert cold.json()["page_title"] == "Café crème"
+    assert warm.content == cold.content
+    assert warm.headers["etag"] == cold.headers["etag"]
+    assert revalidated.status_code == 304
+
+
+def test_synchronous_analysis_stores_its_database_write_time(run_db, monkeypatch):
+    monkeypatch.setattr(result_cache, "memory", LRUCache(16))
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_services] = lambda: None
+
+    async def run_analysis(url, services):
+        return {"credibility_score": 80}, ScrapeResult(text="some page text", bytes_downloaded=14)
+    monkeypatch.setattr(routes, "run_analysis", run_analysis)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/analyze", json={"url": "https://a.example/page"})
+        async with get_async_session_local()() as db:
+            row = await db.get(AnalysisRequest, response.json()["request_id"])
+        return response, row
+
+    response, row = run_db(scenario)
+    assert response.status_code == 200
+    assert row.status == "completed"
+    assert "db_write_seconds" in row.timings
+    assert response.json()["timings"] == row.timings